@@ -0,0 +1,83 @@
+"""Memory per preview row: packed PlanStore versus a list of PreviewItem tuples.
+
+    python -m benchmarks.bench_plan_store [--rows 1M,5M] [--baseline 1M]
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.getcwd())
+
+from src.plan_store import PlanStore
+from src.preview import PreviewItem
+from src.scanner import FileEntry
+
+_UNITS = {"K": 1000, "M": 1000 ** 2}
+_EXTS = (".jpg", ".pdf", ".mp3", ".zip", ".txt", ".py", ".png", ".docx")
+_FOLDERS = ("Pictures", "Docs", "Music", "Archives", "Docs", "Code", "Pictures", "Docs")
+
+
+def _parse_count(text: str) -> int:
+    text = text.strip().upper()
+    if text and text[-1] in _UNITS:
+        return int(float(text[:-1]) * _UNITS[text[-1]])
+    return int(text)
+
+
+def synthetic_rows(n: int, root: str = "/home/user/Downloads"):
+    """Rows shaped like a real preview: ~100 files per folder, mostly MOVEs."""
+    for i in range(n):
+        k = i % len(_EXTS)
+        src_dir = f"{root}/project_{i // 10000}/batch_{i // 100}"
+        name = f"file_{i:08d}{_EXTS[k]}"
+        src = f"{src_dir}/{name}"
+        if i % 10 == 9:
+            action, dest = "SKIP", src
+        elif i % 50 == 7:
+            action, dest = "MOVE", f"{root}/{_FOLDERS[k]}/file_{i:08d} (1){_EXTS[k]}"
+        else:
+            action, dest = "MOVE", f"{root}/{_FOLDERS[k]}/{name}"
+        entry = FileEntry(src, _EXTS[k], 4096 + i, 1_700_000_000_000_000_000 + i, 2049, 1_000_000 + i)
+        yield PreviewItem(src, action, dest, entry)
+
+
+def measure(n: int, packed: bool) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    if packed:
+        rows = PlanStore()
+        for item in synthetic_rows(n):
+            rows.append(item)
+    else:
+        rows = list(synthetic_rows(n))
+    secs = time.perf_counter() - t0
+    current, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    return {
+        "store": "PlanStore" if packed else "list[PreviewItem]",
+        "rows": n,
+        "bytes": current,
+        "bytes_per_row": current / n if n else 0.0,
+        "seconds": secs,
+    }
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--rows", default="1M,5M")
+    ap.add_argument("--baseline", default="1M", help="row counts to also measure as plain tuples ('' to skip)")
+    args = ap.parse_args(argv)
+    results = [measure(_parse_count(c), True) for c in args.rows.split(",") if c]
+    results += [measure(_parse_count(c), False) for c in args.baseline.split(",") if c]
+    print(f"{'store':<18} {'rows':>10} {'MiB':>10} {'bytes/row':>10}")
+    for r in results:
+        print(f"{r['store']:<18} {r['rows']:>10} {r['bytes'] / (1024 * 1024):>10.1f} {r['bytes_per_row']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Items/sec through StreamWorker at different chunk sizes (1 = per-item transport).
+
+    python -m benchmarks.bench_queue [--items 500000] [--chunks 1,64,512,4096]
+"""
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+sys.path.append(os.getcwd())
+
+from src.worker import StreamWorker
+
+
+def _source(n: int):
+    # Shaped like preview rows, cheap to produce so transport dominates
+    for i in range(n):
+        yield ("/src/file", "MOVE", "/dest/file", i)
+
+
+def run_once(n: int, chunk_size: int, maxsize: int) -> dict:
+    q: queue.Queue = queue.Queue(maxsize=maxsize)
+    worker = StreamWorker(lambda: _source(n), q, threading.Event(), chunk_size=chunk_size)
+    received = 0
+    gets = 0
+    t0 = time.perf_counter()
+    worker.start()
+    while True:
+        msg = q.get()
+        gets += 1
+        if msg is None:
+            break
+        if isinstance(msg, list):
+            received += len(msg)
+    secs = time.perf_counter() - t0
+    assert received == n, (received, n)
+    return {"chunk_size": chunk_size, "items": n, "queue_ops": gets, "seconds": secs,
+            "items_per_s": n / secs if secs else 0.0}
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--items", type=int, default=500_000)
+    ap.add_argument("--chunks", default="1,64,512,4096")
+    ap.add_argument("--maxsize", type=int, default=64)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args(argv)
+    print(f"{'chunk':>6} {'queue ops':>10} {'items/s':>12}")
+    for c in (int(x) for x in args.chunks.split(",")):
+        best = max((run_once(args.items, c, args.maxsize) for _ in range(args.repeat)),
+                   key=lambda r: r["items_per_s"])
+        print(f"{best['chunk_size']:>6} {best['queue_ops']:>10} {best['items_per_s']:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""End-to-end benchmarks on a synthetic tree, with regression checks against a baseline.
+
+    python -m benchmarks.suite [--files 2000] [--only scan,preview] [--out results.json]
+    python -m benchmarks.suite --baseline results.json   # exit 1 on a regression
+
+Every benchmark runs on a freshly generated tree (generation is not timed)
+and keeps the best of ``--repeat`` runs. Results are one JSON document; a
+benchmark regresses when its time exceeds the baseline's by more than its
+threshold (THRESHOLDS, or ``--threshold name=ratio``).
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+sys.path.append(os.getcwd())
+
+from benchmarks.synth import make_tree, parse_exts, tree_config
+from src.apply_moves import apply_moves, undo_all_stream
+from src.journal import JournalWriter, iter_entries_reversed, journal_path
+from src.preview import build_preview
+from src.scanner import scan_paths
+
+# Allowed slowdown against the baseline; file-moving benchmarks are noisier
+THRESHOLDS = {
+    "scan": 0.15,
+    "preview": 0.20,
+    "apply_same_device": 0.25,
+    "apply_cross_dir": 0.30,
+    "undo": 0.25,
+    "journal_replay": 0.15,
+}
+
+
+class _Counter:
+    """Reporter that counts events instead of printing them."""
+
+    def __init__(self):
+        self.events: Dict[str, int] = {}
+
+    def __call__(self, event: Dict) -> None:
+        name = event.get("event", "")
+        self.events[name] = self.events.get(name, 0) + 1
+
+
+def _scan(spec: Dict, cfg: Dict, ctx: Dict) -> Dict:
+    t0 = time.perf_counter()
+    n = sum(1 for _ in scan_paths(cfg["include_paths"], cfg["exclude_globs"]))
+    return {"seconds": time.perf_counter() - t0, "items": n}
+
+
+def _preview(spec: Dict, cfg: Dict, ctx: Dict) -> Dict:
+    actions: Dict[str, int] = {}
+    t0 = time.perf_counter()
+    for item in build_preview(cfg):
+        actions[item.action] = actions.get(item.action, 0) + 1
+    return {"seconds": time.perf_counter() - t0, "items": sum(actions.values()), "actions": actions}
+
+
+def _apply(spec: Dict, cfg: Dict, ctx: Dict) -> Dict:
+    report = _Counter()
+    t0 = time.perf_counter()
+    apply_moves(build_preview(cfg), cfg, report=report)
+    secs = time.perf_counter() - t0
+    dest = spec["dest_root"] or spec["include"]
+    return {"seconds": secs, "items": report.events.get("moved", 0), "events": report.events,
+            "cross_device": os.stat(spec["include"]).st_dev != os.stat(dest).st_dev}
+
+
+def _undo(spec: Dict, cfg: Dict, ctx: Dict) -> Dict:
+    apply_moves(build_preview(cfg), cfg, report=_Counter())
+    report = _Counter()
+    t0 = time.perf_counter()
+    undo_all_stream(cfg, report=report)
+    return {"seconds": time.perf_counter() - t0, "items": report.events.get("undone", 0), "events": report.events}
+
+
+def _journal_replay(spec: Dict, cfg: Dict, ctx: Dict) -> Dict:
+    # A long journal (many past batches) read back newest first, as undo-all does
+    path = journal_path(cfg)
+    batches, per_batch = ctx["replay_batches"], spec["files"]
+    for b in range(batches):
+        journal = JournalWriter(path)
+        for i in range(per_batch):
+            journal.record(f"{spec['include']}/b{b}/file_{i:07d}.dat", f"{spec['include']}/Others/file_{i:07d}.dat")
+        journal.close()
+    t0 = time.perf_counter()
+    n = sum(1 for _ in iter_entries_reversed(path))
+    return {"seconds": time.perf_counter() - t0, "items": n, "bytes": os.path.getsize(path)}
+
+
+# name -> (runner, destination outside the include root)
+BENCHMARKS: Dict[str, tuple] = {
+    "scan": (_scan, False),
+    "preview": (_preview, False),
+    "apply_same_device": (_apply, False),
+    "apply_cross_dir": (_apply, True),
+    "undo": (_undo, False),
+    "journal_replay": (_journal_replay, False),
+}
+
+
+def run_one(name: str, tree_args: Dict, repeat: int, ctx: Dict) -> Dict:
+    runner, cross = BENCHMARKS[name]
+    best: Optional[Dict] = None
+    for _ in range(repeat):
+        work = tempfile.mkdtemp(prefix="fileflow-bench-", dir=ctx.get("tmp"))
+        other = None
+        try:
+            if cross:
+                other = tempfile.mkdtemp(prefix="fileflow-bench-dest-", dir=ctx.get("cross_root"))
+            spec = make_tree(work, dest_root=other, **tree_args)
+            res = runner(spec, tree_config(spec, ctx["policy"]), ctx)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+            if other is not None:
+                shutil.rmtree(other, ignore_errors=True)
+        if best is None or res["seconds"] < best["seconds"]:
+            best = res
+    best["name"] = name
+    best["items_per_s"] = best["items"] / best["seconds"] if best["seconds"] else 0.0
+    return best
+
+
+def compare(results: List[Dict], baseline: Dict, thresholds: Dict[str, float]) -> List[Dict]:
+    """One verdict per benchmark present in both runs."""
+    base = {r["name"]: r for r in baseline.get("results", [])}
+    out = []
+    for r in results:
+        b = base.get(r["name"])
+        if b is None or not b.get("seconds"):
+            continue
+        ratio = r["seconds"] / b["seconds"]
+        limit = thresholds.get(r["name"], 0.2)
+        out.append({"name": r["name"], "seconds": r["seconds"], "baseline_seconds": b["seconds"],
+                    "ratio": ratio, "threshold": limit, "regressed": ratio > 1.0 + limit})
+    return out
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--only", default="", help=f"comma-separated subset of: {','.join(BENCHMARKS)}")
+    ap.add_argument("--files", type=int, default=2000)
+    ap.add_argument("--depth", type=int, default=3)
+    ap.add_argument("--fanout", type=int, default=3)
+    ap.add_argument("--exts", default="", help="extension mix, e.g. jpg:30,pdf:10")
+    ap.add_argument("--dups", type=float, default=0.1)
+    ap.add_argument("--collisions", type=float, default=0.1)
+    ap.add_argument("--min-size", type=int, default=256)
+    ap.add_argument("--max-size", type=int, default=64 * 1024)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--policy", choices=("skip", "suffix"), default="suffix")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--replay-batches", type=int, default=20, help="batches in the journal_replay journal")
+    ap.add_argument("--tmp", help="where to generate trees (default: the system temp dir)")
+    ap.add_argument("--cross-root", help="destination parent for apply_cross_dir; put it on another "
+                                         "filesystem to measure copy-based moves")
+    ap.add_argument("--out", help="write the JSON here instead of stdout")
+    ap.add_argument("--baseline", help="earlier --out file to compare against")
+    ap.add_argument("--threshold", action="append", default=[], metavar="NAME=RATIO",
+                    help="override an allowed slowdown, e.g. scan=0.1")
+    args = ap.parse_args(argv)
+
+    names = [n for n in args.only.split(",") if n] or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        ap.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    thresholds = dict(THRESHOLDS)
+    for item in args.threshold:
+        name, _, ratio = item.partition("=")
+        thresholds[name] = float(ratio)
+
+    tree_args = {"files": args.files, "depth": args.depth, "fanout": args.fanout,
+                 "exts": parse_exts(args.exts) or None, "dup_ratio": args.dups,
+                 "collision_ratio": args.collisions, "min_size": args.min_size,
+                 "max_size": args.max_size, "seed": args.seed}
+    ctx = {"policy": args.policy, "tmp": args.tmp, "cross_root": args.cross_root,
+           "replay_batches": args.replay_batches}
+    doc = {
+        "meta": {"python": platform.python_version(), "platform": platform.platform(),
+                 "tree": {k: v for k, v in tree_args.items() if v is not None},
+                 "policy": args.policy, "repeat": args.repeat},
+        "results": [run_one(name, tree_args, args.repeat, ctx) for name in names],
+    }
+    regressed = False
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("tree") != doc["meta"]["tree"]:
+            print("warning: baseline was measured on a different tree", file=sys.stderr)
+        doc["comparison"] = compare(doc["results"], baseline, thresholds)
+        regressed = any(c["regressed"] for c in doc["comparison"])
+
+    text = json.dumps(doc, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    for c in doc.get("comparison", []):
+        if c["regressed"]:
+            print(f"REGRESSION {c['name']}: {c['ratio']:.2f}x baseline (allowed {1 + c['threshold']:.2f}x)",
+                  file=sys.stderr)
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Deterministic synthetic download folders for the benchmarks.
+
+    python -m benchmarks.synth DIR [--files 2000] [--depth 3] [--dups 0.1] [--collisions 0.1]
+
+The same arguments and seed always produce the same tree: names, sizes,
+contents and which files are duplicates or name collisions.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+from typing import Dict, List, Optional
+
+sys.path.append(os.getcwd())
+
+from src.config import get_default_config
+from src.rules import resolve_for_file
+
+INBOX = "inbox"
+DEFAULT_EXTS = {".jpg": 25, ".png": 10, ".pdf": 15, ".docx": 5, ".txt": 10,
+                ".mp3": 10, ".mp4": 5, ".zip": 5, ".py": 5, ".dat": 10}
+
+
+def parse_exts(text: str) -> Dict[str, int]:
+    """``"jpg:30,pdf:10"`` -> ``{".jpg": 30, ".pdf": 10}``."""
+    mix = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        ext, _, weight = part.partition(":")
+        ext = ext.strip().lower()
+        mix[ext if ext.startswith(".") else "." + ext] = int(weight or 1)
+    return mix
+
+
+def _dirs(root: str, depth: int, fanout: int) -> List[str]:
+    dirs = [root]
+    level = [root]
+    for d in range(depth):
+        level = [os.path.join(parent, f"dir_{d}_{i}") for parent in level for i in range(fanout)]
+        dirs.extend(level)
+    return dirs
+
+
+def make_tree(root: str,
+              files: int = 2000,
+              depth: int = 3,
+              fanout: int = 3,
+              exts: Optional[Dict[str, int]] = None,
+              dup_ratio: float = 0.1,
+              collision_ratio: float = 0.1,
+              min_size: int = 256,
+              max_size: int = 64 * 1024,
+              dest_root: Optional[str] = None,
+              seed: int = 1) -> Dict:
+    """Create ``files`` source files under ``root/inbox`` and return the tree's spec.
+
+    Sources are spread over a ``fanout``-ary directory tree ``depth`` levels
+    deep. A ``dup_ratio`` share already exists, byte for byte, in its
+    destination folder (a duplicate skip); a ``collision_ratio`` share takes
+    the name of a file in its destination folder with other content (a
+    conflict). Destination folders live in ``dest_root`` (default: the inbox,
+    as with an empty destination root).
+    """
+    rng = random.Random(seed)
+    exts = exts or DEFAULT_EXTS
+    ext_list = list(exts)
+    weights = [exts[e] for e in ext_list]
+    inbox = os.path.join(root, INBOX)
+    dest_base = dest_root or inbox
+    cfg = get_default_config()
+    dirs = _dirs(inbox, depth, fanout)
+    for d in dirs:
+        os.makedirs(d, exist_ok=True)
+
+    dups = collisions = total_bytes = 0
+    for i in range(files):
+        ext = rng.choices(ext_list, weights)[0]
+        size = rng.randint(min_size, max_size)
+        name = f"file_{i:07d}{ext}"
+        src = os.path.join(dirs[i % len(dirs)], name)
+        data = rng.randbytes(size)
+        with open(src, "wb") as f:
+            f.write(data)
+        total_bytes += size
+        roll = rng.random()
+        if roll < dup_ratio + collision_ratio:
+            folder = os.path.join(dest_base, resolve_for_file(ext, cfg))
+            os.makedirs(folder, exist_ok=True)
+            with open(os.path.join(folder, name), "wb") as f:
+                if roll < dup_ratio:
+                    f.write(data)
+                    dups += 1
+                else:
+                    f.write(rng.randbytes(size))
+                    collisions += 1
+    return {
+        "files": files, "dirs": len(dirs), "depth": depth, "fanout": fanout,
+        "exts": exts, "dup_ratio": dup_ratio, "collision_ratio": collision_ratio,
+        "min_size": min_size, "max_size": max_size, "seed": seed,
+        "duplicates": dups, "collisions": collisions, "bytes": total_bytes,
+        "include": inbox, "dest_root": dest_root or "",
+    }
+
+
+def tree_config(spec: Dict, policy: str = "suffix") -> Dict:
+    """Config sorting a generated tree; caches that would carry over between runs are off."""
+    cfg = get_default_config()
+    cfg["include_paths"] = [spec["include"]]
+    cfg["destination_roots"] = [spec["dest_root"]]
+    beh = cfg["behavior"]
+    beh["conflict_policy"] = policy
+    beh["hash_cache"] = False
+    beh["scan_snapshot"] = False
+    return cfg
+
+
+def main(argv=None) -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("root")
+    ap.add_argument("--files", type=int, default=2000)
+    ap.add_argument("--depth", type=int, default=3)
+    ap.add_argument("--fanout", type=int, default=3)
+    ap.add_argument("--exts", default="", help="extension mix, e.g. jpg:30,pdf:10 (default: a typical downloads mix)")
+    ap.add_argument("--dups", type=float, default=0.1, help="share of files already present in the destination")
+    ap.add_argument("--collisions", type=float, default=0.1, help="share of files whose name is taken in the destination")
+    ap.add_argument("--min-size", type=int, default=256)
+    ap.add_argument("--max-size", type=int, default=64 * 1024)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+    spec = make_tree(args.root, args.files, args.depth, args.fanout, parse_exts(args.exts) or None,
+                     args.dups, args.collisions, args.min_size, args.max_size, seed=args.seed)
+    print(json.dumps(spec, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,12 @@
 import os
 import sys
 sys.path.append(os.getcwd())
-from src.gui import FileFlowGUI
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # Any arguments: headless CLI, without importing Tk
+        from src.cli import main
+        sys.exit(main())
+    from src.gui import FileFlowGUI
     app = FileFlowGUI()
     app.mainloop()
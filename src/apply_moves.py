@@ -1,156 +1,337 @@
 import os
 import shutil
-from typing import Dict, Iterable, Tuple
-import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
 import time
-import re
-PreviewItem = Tuple[str, str, str]
-from src.utils.hash_utils import file_hash
+from src import instrument
+from src.dest_index import DestIndex
+from src.journal import JournalWriter, index_path, iter_entries_reversed, iter_last_batch_reversed, journal_path, open_journal
+from src.plan import revalidate
+from src.preview import PreviewItem
+from src.utils.hash_cache import open_hash_caches
+from src.utils.dedup import DedupStats, files_identical
+from src.utils.hash_utils import hash_algorithm
+from src.utils.os_ops import stat_or_none
+from src.utils.transfer import DeviceMap, TransferStats, move_file
 
-_SUFFIX_RE = re.compile(r"^(?P<base>.*) \((?P<num>\d+)\)$")
+# Receives one dict per event ({"event": name, ...fields}) instead of printed lines
+Reporter = Callable[[Dict], None]
 
-def _next_suffixed_name(path: str) -> str:
-    ddir, fname = os.path.split(path)
-    base, ext = os.path.splitext(fname)
-    m = _SUFFIX_RE.match(base)
-    if m:
-        base_core = m.group("base")
-        n = int(m.group("num")) + 1
-        new_base = f"{base_core} ({n})"
-    else:
-        new_base = f"{base} (1)"
-    return os.path.join(ddir, new_base + ext)
-
-
-def _now_iso() -> str:
-    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+def _emitter(report: Optional[Reporter]):
+    if report is None:
+        return lambda event, text, **fields: print(text)
+    return lambda event, text, **fields: report(dict(event=event, **fields))
 
 def _journal_path(cfg: Dict) -> str:
-    return os.path.join(cfg["include_paths"][0], ".fileflow_journal.jsonl")
+    return journal_path(cfg)
 
-def _append_journal(cfg: Dict, src_before: str, dest_after: str) -> None:
-    path = _journal_path(cfg)
-    entry = {
-        "src_before": src_before,
-        "dest_after": dest_after,
-        "time": _now_iso()
-    }
-    with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(entry) + "\n")
-
-def _resolve_conflict(dest: str, policy: str) -> str:
-    if not os.path.exists(dest):
+def _resolve_conflict(dest: str, policy: str, index: DestIndex) -> str:
+    if not index.taken(dest):
         return dest
     if policy == "skip":
         return dest
-    candidate = _next_suffixed_name(dest)
-    while os.path.exists(candidate):
-        candidate = _next_suffixed_name(candidate)
-    return candidate
+    return index.allocate_suffix(dest)
 
 
 
 
-def apply_moves(preview_stream: Iterable[PreviewItem], cfg: Dict, dry_run: bool = False) -> None:
+def apply_moves(preview_stream: Iterable[PreviewItem], cfg: Dict, dry_run: bool = False,
+                cancel_event: Optional[threading.Event] = None, report: Optional[Reporter] = None) -> None:
+    emit = _emitter(report)
     policy = cfg.get("behavior", {}).get("conflict_policy", "suffix").lower()
 
     # If dry run, do not touch journal; only print planned moves
     if dry_run:
-        for src, action, dest in preview_stream:
+        index = DestIndex()
+        for src, action, dest, _entry in revalidate(preview_stream, cfg):
+            if action == "MISSING":
+                emit("missing", f"[DRY RUN] {src} no longer exists", src=src)
+                continue
             if action != "MOVE":
                 continue
-            final_dest = _resolve_conflict(dest, policy)
-            print(f"[DRY RUN] Moving {src} --> {final_dest}")
+            final_dest = _resolve_conflict(dest, policy, index)
+            index.propose(final_dest)
+            emit("planned", f"[DRY RUN] Moving {src} --> {final_dest}", src=src, dest=final_dest)
         return
-    for src, action, dest in preview_stream:
+    caches = open_hash_caches(cfg)
+    stats = DedupStats()
+    journal = open_journal(cfg)
+    transfers = TransferStats()
+    workers = int(cfg.get("behavior", {}).get("apply_workers", 1) or 1)
+    if cancel_event is None:
+        cancel_event = threading.Event()
+    runner = _MoveRunner(journal, DestIndex(), transfers, workers, cancel_event, emit)
+    try:
+        _apply_stream(preview_stream, cfg, policy, caches, stats, runner)
+    except BaseException:
+        # e.g. KeyboardInterrupt: queued moves of the current chunk are not started
+        cancel_event.set()
+        raise
+    finally:
+        runner.close()
+        journal.close()
+        if runner.cancelled:
+            emit("cancelled", f"[CANCELLED] {runner.cancelled} planned moves were not performed", count=runner.cancelled)
+        if caches is not None:
+            caches.save()
+        if stats.compared:
+            emit("dedup", f"[DEDUP] {stats.summary()}", stats=stats.as_dict())
+        emit("transfer", f"[TRANSFER] {transfers.summary()}", stats=transfers.as_dict())
+        metrics = instrument.current()
+        if metrics is not None:
+            metrics.merge("dedup", stats.as_dict())
+            metrics.merge("transfer", transfers.as_dict())
+            metrics.merge("journal", {"entries_written": journal.entries_written,
+                                      "bytes_written": journal.bytes_written, "fsyncs": journal.fsyncs})
+            if caches is not None:
+                metrics.count("hash_cache.hits", caches.hits)
+                metrics.count("hash_cache.misses", caches.misses)
+
+# Planned moves are journaled and executed in chunks of this many entries,
+# or whatever accumulated within _CHUNK_SECONDS
+_CHUNK_SECONDS = 0.25
+
+# (journal seq, src, final dest, same device as dest?, size if known)
+_Planned = Tuple[int, str, str, Optional[bool], Optional[int]]
+
+class _MoveRunner:
+    """Executes journaled chunks of planned moves, optionally on a bounded pool.
+
+    Every intent of a chunk is committed to the journal before any of its
+    moves starts, so the journal order is the plan order whatever order the
+    workers finish in. Destination folders are created once per batch and
+    moves into the same final path never run concurrently.
+    """
+
+    def __init__(self, journal: JournalWriter, index: DestIndex, transfers: TransferStats,
+                 workers: int = 1, cancel_event: Optional[threading.Event] = None, emit=None):
+        self.journal = journal
+        self.emit = emit or _emitter(None)
+        self.index = index
+        self.transfers = transfers
+        self.cancel_event = cancel_event
+        self.cancelled = 0
+        self._pool = None
+        if workers > 1:
+            self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fileflow-apply")
+        self._made_dirs: set = set()
+        self._dir_lock = threading.Lock()
+        self._cancel_lock = threading.Lock()
+        self._path_locks = [threading.Lock() for _ in range(64)]
+        self.metrics = instrument.current()
+
+    def _ensure_dir(self, ddir: str) -> None:
+        if ddir in self._made_dirs:
+            return
+        with self._dir_lock:
+            if ddir not in self._made_dirs:
+                os.makedirs(ddir, exist_ok=True)
+                self._made_dirs.add(ddir)
+
+    def _move_one(self, planned: _Planned) -> None:
+        """Move one planned file, unless the batch was cancelled."""
+        seq, src, final_dest, same_device, size = planned
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            self.journal.mark_failed(seq)
+            # Counted here: an interrupted run() never sees these results
+            with self._cancel_lock:
+                self.cancelled += 1
+            return
+        metrics = self.metrics
+        t0 = time.perf_counter() if metrics is not None else 0.0
+        try:
+            self._ensure_dir(os.path.dirname(final_dest))
+            with self._path_locks[hash(final_dest) % len(self._path_locks)]:
+                kind = move_file(src, final_dest, same_device, size, self.transfers)
+            # The source name is deliberately left in the index; reusing it
+            # within the same batch would only save a suffix
+            self.index.mark_existing(final_dest)
+            if metrics is not None:
+                metrics.add_time("apply.move", time.perf_counter() - t0)
+                metrics.count("apply.moved")
+                metrics.count(f"apply.moved.{kind}")
+            self.emit("moved", f"[MOVED] {src} --> {final_dest}", src=src, dest=final_dest, kind=kind)
+        except FileExistsError:
+            # Something took the destination after planning; leave the source where it is
+            if metrics is not None:
+                metrics.count("apply.conflicts")
+            self.journal.mark_failed(seq)
+            self.index.mark_existing(final_dest)
+            self.emit("conflict", f"[CONFLICT] {src} not moved: {final_dest} appeared meanwhile",
+                      src=src, dest=final_dest)
+        except Exception as e:
+            if metrics is not None:
+                metrics.count("apply.errors")
+            self.journal.mark_failed(seq)
+            self.emit("error", f"[ERROR] Could not move {src} to {final_dest}: {e}", src=src, dest=final_dest, error=str(e))
+
+    def run(self, chunk: List[_Planned]) -> None:
+        # Intents reach the journal file before any of these moves starts
+        if self.metrics is not None:
+            with self.metrics.timer("journal.commit"):
+                self.journal.commit()
+        else:
+            self.journal.commit()
+        if self._pool is None:
+            for planned in chunk:
+                self._move_one(planned)
+        else:
+            for fut in [self._pool.submit(self._move_one, planned) for planned in chunk]:
+                fut.result()
+        chunk.clear()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+def _skip_taken(src: str, dest: str, entry, dest_st: Optional[os.stat_result], caches,
+                stats: DedupStats, algo: str, emit) -> None:
+    """Report a source left in place because the skip policy found ``dest`` taken.
+
+    The skip policy never writes over an existing destination: an identical
+    file is a ``skip_duplicate``, anything else (different content, or a name
+    planned earlier in the batch) a ``skip_conflict``. Before the scandir
+    rework a different file at ``dest`` was overwritten by the move.
+    """
+    if dest_st is not None:
+        cache = caches.for_path(src) if caches is not None else None
+        try:
+            if files_identical(src, dest, entry, dest_st, cache, stats, algo):
+                emit("skip_duplicate", f"[SKIP DUPLICATE] {src} == {dest}", src=src, dest=dest)
+                return
+        except Exception:
+            pass
+    emit("skip_conflict", f"[SKIP CONFLICT] {src} -> {dest} already exists", src=src, dest=dest)
+
+def _apply_stream(preview_stream: Iterable[PreviewItem], cfg: Dict, policy: str, caches,
+                  stats: DedupStats, runner: _MoveRunner) -> None:
+    algo = hash_algorithm(cfg)
+    emit = runner.emit
+    index = runner.index
+    devices = DeviceMap()
+    chunk_size = max(1, int(cfg.get("behavior", {}).get("journal_batch_size", 256) or 1))
+    chunk: List[_Planned] = []
+    chunk_started = 0.0
+    # Plans may be stale: sources that changed since the preview are planned again
+    for src, action, dest, entry in revalidate(preview_stream, cfg, stats, caches):
+        if runner.cancel_event is not None and runner.cancel_event.is_set():
+            break
+        if action == "MISSING":
+            emit("missing", f"[SKIP MISSING] {src} no longer exists", src=src)
+            continue
         if action != "MOVE":
             continue
 
-        final_dest = _resolve_conflict(dest, policy)
-
+        final_dest = dest
         try:
-            os.makedirs(os.path.dirname(final_dest), exist_ok=True)
-            if policy == "skip" and os.path.exists(dest):
-                try:
-                    if file_hash(src) == file_hash(dest):
-                        print(f"[SKIP DUPLICATE] {src} == {dest}")
-                        continue
-                except Exception:
-                    pass
-            shutil.move(src, final_dest)
-            _append_journal(cfg, src, final_dest)
-            print(f"[MOVED] {src} --> {final_dest}")
+            dest_st = stat_or_none(dest) if index.on_disk(dest) else None
+            final_dest = _resolve_conflict(dest, policy, index)
+            if policy == "skip" and index.taken(dest):
+                _skip_taken(src, dest, entry, dest_st, caches, stats, algo, emit)
+                continue
+            index.propose(final_dest)
         except Exception as e:
-            print(f"[ERROR] Could not move {src} to {final_dest}: {e}")
+            emit("error", f"[ERROR] Could not move {src} to {final_dest}: {e}", src=src, dest=final_dest, error=str(e))
+            continue
+
+        if not chunk:
+            chunk_started = time.monotonic()
+        # Classify up front: same filesystem -> rename, otherwise copy + unlink
+        same_device = None
+        if entry is not None:
+            dest_dev = devices.dev_of_dir(os.path.dirname(final_dest))
+            same_device = None if dest_dev is None else entry.dev == dest_dev
+        size = entry.size if entry is not None else None
+        chunk.append((runner.journal.record(src, final_dest), src, final_dest, same_device, size))
+        if len(chunk) >= chunk_size or time.monotonic() - chunk_started >= _CHUNK_SECONDS:
+            runner.run(chunk)
+    if chunk:
+        runner.run(chunk)
 
-def undo_last(cfg: Dict) -> None:
+def undo_last(cfg: Dict, report: Optional[Reporter] = None) -> None:
+    emit = _emitter(report)
     journal_file = _journal_path(cfg)
     if not os.path.exists(journal_file):
-        print("No journal found — nothing to undo.")
+        emit("no_journal", "No journal found — nothing to undo.", journal=journal_file)
         return
-    with open(journal_file, "r", encoding="utf-8") as f:
-        lines = [json.loads(line) for line in f if line.strip()]
-    if not lines:
-        print("Journal is empty — nothing to undo.")
-        return
-    latest_time = max(entry["time"] for entry in lines if "time" in entry)
-    latest_entries = [e for e in lines if e.get("time") == latest_time]
     count = 0
-    for entry in reversed(latest_entries):
-        src_before = entry["src_before"]
-        dest_after = entry["dest_after"]
+    seen = False
+    failed = set()
+    # Newest batch only, newest entry first; markers follow their intent so are seen first
+    for entry in iter_last_batch_reversed(journal_file):
+        seen = True
+        if entry.get("failed"):
+            failed.add((entry.get("batch"), entry.get("seq")))
+            continue
+        src_before = entry.get("src_before")
+        dest_after = entry.get("dest_after")
+        if not src_before or not dest_after or (entry.get("batch"), entry.get("seq")) in failed:
+            continue
         if os.path.exists(dest_after):
             os.makedirs(os.path.dirname(src_before), exist_ok=True)
             shutil.move(dest_after, src_before)
-            print(f"[UNDONE] {dest_after} -> {src_before}")
+            emit("undone", f"[UNDONE] {dest_after} -> {src_before}", src_before=src_before, dest_after=dest_after)
             count += 1
+    if not seen:
+        emit("empty", "Journal is empty — nothing to undo.", journal=journal_file)
+        return
 
-    print(f"Undo complete: {count} files restored.")
+    metrics = instrument.current()
+    if metrics is not None:
+        metrics.count("undo.restored", count)
+    emit("done", f"Undo complete: {count} files restored.", restored=count)
 
-def undo_all_stream(cfg: Dict) -> None:
+def undo_all_stream(cfg: Dict, report: Optional[Reporter] = None) -> None:
+    emit = _emitter(report)
     journal_file = _journal_path(cfg)
     if not os.path.isfile(journal_file):
-        print(f"No journal file found at {journal_file}")
+        emit("no_journal", f"No journal file found at {journal_file}", journal=journal_file)
         return
 
     restored = 0
     missing = 0
 
-    print(f"Restoring from journal: {journal_file}\n")
-    with open(journal_file, "r", encoding="utf-8") as f:
-        lines = list(f)  
-    for raw in reversed(lines):
-        try:
-            entry = json.loads(raw)
-        except json.JSONDecodeError:
+    emit("start", f"Restoring from journal: {journal_file}\n", journal=journal_file)
+    failed = set()
+    # Read backwards block by block so memory stays flat however long the journal is
+    for entry in iter_entries_reversed(journal_file):
+        # Failure markers always follow their intent, so they are seen first here
+        if entry.get("failed"):
+            failed.add((entry.get("batch"), entry.get("seq")))
             continue
-
         src_before = entry.get("src_before")
         dest_after = entry.get("dest_after")
         if not src_before or not dest_after:
             continue
+        if (entry.get("batch"), entry.get("seq")) in failed:
+            continue
 
         if os.path.exists(dest_after):
             try:
                 os.makedirs(os.path.dirname(src_before), exist_ok=True)
                 shutil.move(dest_after, src_before)
-                print(f"[UNDONE] {dest_after} -> {src_before}")
+                emit("undone", f"[UNDONE] {dest_after} -> {src_before}", src_before=src_before, dest_after=dest_after)
                 restored += 1
             except Exception as e:
-                print(f"[ERROR] Could not undo {dest_after}: {e}")
+                emit("error", f"[ERROR] Could not undo {dest_after}: {e}", dest_after=dest_after, error=str(e))
         else:
-            print(f"[MISSING] {dest_after}")
+            emit("missing", f"[MISSING] {dest_after}", dest_after=dest_after)
             missing += 1
 
-    print(f"\n=== Undo Complete ===\nRestored: {restored}\nMissing: {missing}")
+    metrics = instrument.current()
+    if metrics is not None:
+        metrics.merge("undo", {"restored": restored, "missing": missing})
+    emit("done", f"\n=== Undo Complete ===\nRestored: {restored}\nMissing: {missing}", restored=restored, missing=missing)
 
 def _reset_journal(cfg: Dict) -> None:
     path = _journal_path(cfg)
-    try:
-        if os.path.exists(path):
-            os.remove(path)
-    except Exception:
-        pass
+    for p in (path, index_path(path)):
+        try:
+            if os.path.exists(p):
+                os.remove(p)
+        except Exception:
+            pass
     os.makedirs(os.path.dirname(path), exist_ok=True)
     with open(path, "w", encoding="utf-8") as f:
         f.write("")
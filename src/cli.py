@@ -0,0 +1,209 @@
+"""Headless FileFlow: preview, apply and undo without a display.
+
+    python -m src preview            # planned actions as JSON lines
+    python -m src dry-run | apply    # resolve conflicts / move files
+    python -m src undo-last | undo-all
+    python -m src watch              # keep sorting new arrivals
+
+Every result is one JSON object per line on stdout. Nothing here imports
+Tk, and the heavier modules are only imported by the subcommand that
+needs them.
+"""
+import argparse
+import json
+import signal
+import sys
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+class JsonLines:
+    """Thread-safe JSON-lines writer; every line is flushed within ``flush_interval`` seconds.
+
+    Busy output is flushed at most once per interval. A line written after a
+    recent flush arms a timer, so it also goes out when the output then goes
+    quiet. ``flush_interval=0`` flushes every line.
+    """
+
+    def __init__(self, stream=None, flush_interval: float = 0.2):
+        self.stream = stream or sys.stdout
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+        self._timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+
+    def __call__(self, obj: Dict) -> None:
+        line = json.dumps(obj, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self.stream.write(line)
+            now = time.monotonic()
+            wait = self.flush_interval - (now - self._last_flush)
+            if wait <= 0:
+                self.stream.flush()
+                self._last_flush = now
+            elif self._timer is None:
+                self._timer = threading.Timer(wait, self._flush_late)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_late(self) -> None:
+        with self._lock:
+            self._timer = None
+            try:
+                self.stream.flush()
+            except (OSError, ValueError):
+                # Reader gone or stream closed; the main thread reports it on its next write
+                return
+            self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self.stream.flush()
+
+
+def _load_cfg(args) -> Dict:
+    from .config import load_config
+    cfg = load_config(args.config)
+    if args.include:
+        cfg["include_paths"] = list(args.include)
+        cfg["destination_roots"] = [""] * len(args.include)
+    if args.policy:
+        cfg.setdefault("behavior", {})["conflict_policy"] = args.policy
+    return cfg
+
+
+def _preview(cfg: Dict, out: JsonLines, full_rescan: bool) -> int:
+    from .dir_snapshot import open_dir_snapshot
+    from .preview import build_preview
+    from .utils.dedup import DedupStats
+    stats = DedupStats()
+    snapshot = open_dir_snapshot(cfg, full_rescan)
+    counts: Dict[str, int] = {}
+    for src, action, dest, entry in build_preview(cfg, stats, snapshot):
+        counts[action] = counts.get(action, 0) + 1
+        out({"src": src, "action": action, "dest": dest, "size": entry.size if entry is not None else None})
+    summary = {"event": "summary", "total": sum(counts.values()), "actions": counts, "dedup": stats.as_dict()}
+    if snapshot is not None:
+        summary["scan"] = snapshot.as_dict()
+    out(summary)
+    return 0
+
+
+def _apply(cfg: Dict, out: JsonLines, dry_run: bool, full_rescan: bool) -> int:
+    from .apply_moves import apply_moves
+    from .dir_snapshot import open_dir_snapshot
+    from .preview import build_preview
+    cancel = threading.Event()
+
+    def on_sigint(signum, frame):
+        # Let the moves in flight finish and start no new ones; a second Ctrl-C aborts
+        cancel.set()
+        signal.signal(signal.SIGINT, signal.default_int_handler)
+
+    try:
+        previous = signal.signal(signal.SIGINT, on_sigint)
+    except ValueError:
+        # Not the main thread: no signal handling, KeyboardInterrupt cannot arrive here either
+        previous = None
+    try:
+        preview = build_preview(cfg, snapshot=open_dir_snapshot(cfg, full_rescan))
+        apply_moves(preview, cfg, dry_run=dry_run, cancel_event=cancel, report=out)
+    except KeyboardInterrupt:
+        out({"event": "interrupted"})
+        return 130
+    finally:
+        if previous is not None:
+            signal.signal(signal.SIGINT, previous)
+    if cancel.is_set():
+        out({"event": "interrupted"})
+        return 130
+    return 0
+
+
+def _undo(cfg: Dict, out: JsonLines, everything: bool) -> int:
+    from .apply_moves import undo_all_stream, undo_last
+    (undo_all_stream if everything else undo_last)(cfg, report=out)
+    return 0
+
+
+def _watch(cfg: Dict, out: JsonLines, args) -> int:
+    from .watch import Watcher
+    watcher = Watcher(cfg, settle=args.settle, force_polling=args.poll, poll_interval=args.interval, report=out)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        watcher.stop()
+    out({"event": "stopped", "batches": watcher.batches})
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="fileflow", description="Sort files by type without the GUI.")
+    ap.add_argument("--config", help="config file (default: the GUI's config)")
+    ap.add_argument("--include", action="append", metavar="DIR",
+                    help="folder to sort instead of the configured include paths (repeatable)")
+    ap.add_argument("--policy", choices=("skip", "suffix"), help="override behavior.conflict_policy")
+    ap.add_argument("--metrics", action="store_true",
+                    help="record per-stage counters and timings and emit them as a final 'metrics' event "
+                         "(default: behavior.metrics)")
+    ap.add_argument("--metrics-out", metavar="FILE", help="also write the metrics JSON to FILE (implies --metrics)")
+    sub = ap.add_subparsers(dest="command", required=True)
+    scans = [sub.add_parser("preview", help="list the planned action for every file"),
+             sub.add_parser("dry-run", help="show the moves apply would make"),
+             sub.add_parser("apply", help="move the files and journal the moves")]
+    for p in scans:
+        p.add_argument("--full-rescan", action="store_true",
+                       help="list every folder again instead of reusing unchanged ones from the last scan")
+    sub.add_parser("undo-last", help="undo the most recent apply")
+    sub.add_parser("undo-all", help="undo every journaled move, newest first")
+    w = sub.add_parser("watch", help="keep running and sort files as they arrive")
+    w.add_argument("--settle", type=float, default=2.0,
+                   help="seconds a new file must stay unchanged before it is sorted (default 2)")
+    w.add_argument("--poll", action="store_true", help="poll folders instead of using inotify")
+    w.add_argument("--interval", type=float, default=2.0, help="polling interval in seconds (default 2)")
+    return ap
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    # Watch events are few and a consumer acts on each as it arrives
+    out = JsonLines(flush_interval=0.0 if args.command == "watch" else 0.2)
+    metrics = None
+    try:
+        cfg = _load_cfg(args)
+        if not cfg.get("include_paths"):
+            out({"event": "error", "error": "no include paths configured"})
+            return 2
+        if args.metrics or args.metrics_out or cfg.get("behavior", {}).get("metrics", False):
+            from . import instrument
+            metrics = instrument.enable()
+        if args.command == "preview":
+            return _preview(cfg, out, args.full_rescan)
+        if args.command == "watch":
+            return _watch(cfg, out, args)
+        if args.command in ("apply", "dry-run"):
+            return _apply(cfg, out, dry_run=args.command == "dry-run", full_rescan=args.full_rescan)
+        return _undo(cfg, out, everything=args.command == "undo-all")
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # Reader went away (e.g. piped into head)
+        return 0
+    finally:
+        if metrics is not None:
+            from . import instrument
+            instrument.disable()
+            try:
+                out({"event": "metrics", **metrics.as_dict()})
+                if args.metrics_out:
+                    metrics.dump(args.metrics_out)
+            except (BrokenPipeError, OSError):
+                pass
+        try:
+            out.close()
+        except BrokenPipeError:
+            pass
@@ -2,7 +2,7 @@ import json
 import os
 import platform
 from typing import Any, Dict, List, Tuple
-from .types_map import infer_category, CATEGORY_DESTINATION_DEFAULT
+from .utils.hash_utils import available_algorithms
 
 def _user_home( ) -> str:
     return os.path.expanduser("~")
@@ -49,7 +49,21 @@ def get_default_config() -> Dict[str, Any]:
         "behavior": {
             "move": True,
             "conflict_policy": "skip",
-            "sort_subfolders": True
+            "sort_subfolders": True,
+            "scan_workers": 1,
+            "scan_deterministic": True,
+            "scan_snapshot": True,
+            "hash_algorithm": "blake2b",
+            "hash_workers": 2,
+            "hash_cache": True,
+            "hash_cache_max_entries": 200000,
+            # Hash cache and scan snapshot location; empty = "cache" next to the default config file
+            "cache_dir": "",
+            "journal_batch_size": 256,
+            "journal_fsync_every": 0,
+            "journal_fsync_interval_ms": 0,
+            "apply_workers": 1,
+            "metrics": False,
         },
         "ui": { 
             "preview_window_limit":1000,
@@ -70,14 +84,6 @@ def validate_config(cfg: Dict[str, Any]) -> Tuple[bool, List[str]]:
 
     if not isinstance(cfg.get("version"), int):
         errors.append("version should be an integer")
-    if isinstance(beh, dict):
-        mv = beh.get("move")
-        cp = beh.get("conflict_policy")
-        if not isinstance(mv, bool):
-            errors.append("behavior.move should be a boolean")
-        if cp not in {"skip", "suffix"}:
-            errors.append("behavior.conflict_policy should be 'skip' or 'suffix'")
-
 
     inc = cfg.get("include_paths")
     if not _is_str_list(inc) or not inc:
@@ -108,8 +114,9 @@ def validate_config(cfg: Dict[str, Any]) -> Tuple[bool, List[str]]:
                 for e in exts:
                     if not e.startswith("."):
                         errors.append(f"custom_rules[{i}].extensions should start with a dot: {e}")
-            if not isinstance(dest, str) or not dest.strip():
-                errors.append(f"custom_rules[{i}].destination should be a non-empty string")
+            # A rule without a destination is ignored by the resolver (the default "Pictures" rule)
+            if dest is not None and not isinstance(dest, str):
+                errors.append(f"custom_rules[{i}].destination should be a string")
 
     beh = cfg.get("behavior")
     if not isinstance(beh, dict):
@@ -121,6 +128,25 @@ def validate_config(cfg: Dict[str, Any]) -> Tuple[bool, List[str]]:
             errors.append("behavior.move should be a boolean")
         if cp not in {"skip","suffix"}:
             errors.append("behavior.conflict_policy should be 'skip' or 'suffix'") # more polcies complex later
+        ha = beh.get("hash_algorithm", "blake2b")
+        # Exactly what hash_utils.resolve_algorithm accepts; anything else would silently fall back
+        if not isinstance(ha, str) or ha.strip().lower() not in available_algorithms():
+            errors.append(f"behavior.hash_algorithm should be one of: {', '.join(available_algorithms())}")
+        hw = beh.get("hash_workers", 2)
+        if not isinstance(hw, int) or not (1 <= hw <= 64):
+            errors.append("behavior.hash_workers should be an integer between 1 and 64")
+        sw = beh.get("scan_workers", 1)
+        if not isinstance(sw, int) or not (1 <= sw <= 64):
+            errors.append("behavior.scan_workers should be an integer between 1 and 64")
+        if not isinstance(beh.get("scan_snapshot", True), bool):
+            errors.append("behavior.scan_snapshot should be a boolean")
+        if not isinstance(beh.get("cache_dir", ""), str):
+            errors.append("behavior.cache_dir should be a string")
+        if not isinstance(beh.get("metrics", False), bool):
+            errors.append("behavior.metrics should be a boolean")
+        aw = beh.get("apply_workers", 1)
+        if not isinstance(aw, int) or not (1 <= aw <= 64):
+            errors.append("behavior.apply_workers should be an integer between 1 and 64")
 
     ui = cfg.get("ui")
     if not isinstance(ui, dict):
@@ -187,34 +213,6 @@ def save_config(cfg: Dict[str, Any], path: str | None = None) -> None:
         json.dump(cfg, f, indent=2, ensure_ascii=False)
 
 def resolve_destination_for_extension(ext: str, cfg: Dict[str, Any]) -> str:
-    # Normalize incoming ext
-    if not ext:
-        return CATEGORY_DESTINATION_DEFAULT["Other"]
-    e = ext.lower().strip()
-    if not e.startswith('.'):
-        e = '.' + e
-    rules_map = cfg.get("rules", {}) or {}
-    # Normalize keys in one pass so both "jpg" and ".jpg" work
-    norm_rules = {}
-    for k, v in rules_map.items():
-        kk = k.strip().lower()
-        if not kk.startswith('.'):
-            kk = '.' + kk
-        norm_rules[kk] = (v or "").strip()
-    if e in norm_rules and norm_rules[e]:
-        return norm_rules[e]
-    custom_rules = cfg.get("custom_rules", []) or []
-    for r in custom_rules:
-        exts = r.get("extensions") or []
-        dest = (r.get("destination") or "").strip()
-        # Normalize list elements
-        for x in exts:
-            xx = x.lower().strip()
-            if not xx.startswith('.'):
-                xx = '.' + xx
-            if e == xx and dest:
-                return dest
-
-    # Fallback to category mapping
-    cat = infer_category(e)
-    return CATEGORY_DESTINATION_DEFAULT.get(cat, CATEGORY_DESTINATION_DEFAULT["Other"])
+    # Lookups go through the compiled resolver; imported here to avoid a cycle
+    from .rules import get_resolver
+    return get_resolver(cfg).resolve(ext)
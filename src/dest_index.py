@@ -0,0 +1,114 @@
+import os
+import re
+import sys
+import threading
+from typing import Dict, Set, Tuple
+
+# os.path.exists is case-insensitive on the default Windows and macOS filesystems
+_FOLD_CASE = sys.platform.startswith(("win", "darwin"))
+
+
+_SUFFIX_RE = re.compile(r"^(?P<base>.*) \((?P<num>\d+)\)$")
+
+
+def split_suffix(fname: str) -> Tuple[str, int, str]:
+    """Split ``name (N).ext`` into (name, N + 1, ext); unsuffixed names start at 1."""
+    base, ext = os.path.splitext(fname)
+    m = _SUFFIX_RE.match(base)
+    if m:
+        return m.group("base"), int(m.group("num")) + 1, ext
+    return base, 1, ext
+
+
+def _name_key(name: str) -> str:
+    return name.lower() if _FOLD_CASE else name
+
+
+class _DirNames:
+    __slots__ = ("existing", "proposed")
+
+    def __init__(self, existing: Set[str]):
+        self.existing = existing
+        self.proposed: Set[str] = set()
+
+
+class DestIndex:
+    """In-memory view of destination directories for conflict checks.
+
+    Each directory is listed once, with a single scandir, the first time a
+    path inside it is checked. Names planned during the run are tracked next
+    to the on-disk names, so existence checks and suffix probing cost no
+    syscalls after that first touch.
+    """
+
+    def __init__(self):
+        self._dirs: Dict[str, _DirNames] = {}
+        # (dir, name, ext, first index) -> lowest index not yet known to be taken
+        self._cursors: Dict[Tuple[str, str, str, int], int] = {}
+        self._lock = threading.Lock()
+        self.dirs_loaded = 0
+
+    def _load(self, ddir: str) -> _DirNames:
+        names = self._dirs.get(ddir)
+        if names is not None:
+            return names
+        existing: Set[str] = set()
+        try:
+            with os.scandir(ddir or ".") as it:
+                for entry in it:
+                    existing.add(_name_key(entry.name))
+        except OSError:
+            # Missing destination folder: nothing exists there yet
+            pass
+        with self._lock:
+            names = self._dirs.get(ddir)
+            if names is None:
+                names = self._dirs[ddir] = _DirNames(existing)
+                self.dirs_loaded += 1
+        return names
+
+    def on_disk(self, path: str) -> bool:
+        ddir, name = os.path.split(path)
+        return _name_key(name) in self._load(ddir).existing
+
+    def is_proposed(self, path: str) -> bool:
+        ddir, name = os.path.split(path)
+        return _name_key(name) in self._load(ddir).proposed
+
+    def taken(self, path: str) -> bool:
+        ddir, name = os.path.split(path)
+        names = self._load(ddir)
+        key = _name_key(name)
+        return key in names.existing or key in names.proposed
+
+    def propose(self, path: str) -> None:
+        ddir, name = os.path.split(path)
+        self._load(ddir).proposed.add(_name_key(name))
+
+    def mark_existing(self, path: str) -> None:
+        """Record that ``path`` now exists on disk (e.g. after a move)."""
+        ddir, name = os.path.split(path)
+        self._load(ddir).existing.add(_name_key(name))
+
+    def allocate_suffix(self, path: str) -> str:
+        """First free ``name (N).ext`` after ``path`` in its directory.
+
+        Same result as probing ``name (1)``, ``name (2)``, ... (or upward from
+        an existing ``(N)``), but the probe position is remembered per
+        (directory, name, ext). Names are never released during a run, so the
+        cursor only moves forward and repeated collisions cost O(1) amortized.
+        """
+        ddir, fname = os.path.split(path)
+        core, start, ext = split_suffix(fname)
+        names = self._load(ddir)
+        key = (ddir, _name_key(core), _name_key(ext), start)
+        n = self._cursors.get(key, start)
+        while True:
+            candidate = f"{core} ({n}){ext}"
+            k = _name_key(candidate)
+            if k not in names.existing and k not in names.proposed:
+                break
+            n += 1
+        # The caller usually proposes the candidate; re-checking it next time is one lookup
+        self._cursors[key] = n
+        return os.path.join(ddir, candidate)
@@ -0,0 +1,145 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from .scanner import SNAPSHOT_FILENAME, FileEntry, refresh_entry
+from .utils.hash_cache import root_state_path, state_dir
+from .utils.os_ops import RACY_NS
+
+# 2: listings no longer contain FileFlow's own files
+_VERSION = 2
+
+
+def snapshot_fingerprint(exclude_patterns: List[str], include_hidden: bool, recursive: bool) -> str:
+    """Digest of the scan settings a stored listing depends on."""
+    blob = json.dumps([list(exclude_patterns), bool(include_hidden), bool(recursive)])
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+def _root_of(path: str, roots: List[str]) -> Optional[str]:
+    for root in roots:
+        if path == root or path.startswith(root.rstrip(os.sep) + os.sep):
+            return root
+    return None
+
+
+class DirSnapshot:
+    """Directory mtimes and filtered listings from the last scan, one file per include root.
+
+    The files live in the state directory, not in the roots, so saving them
+    does not change the mtime of the directories they describe.
+
+    A directory whose mtime still equals the stored one has the same entries,
+    so its listing is served from here instead of scandir. Each served file
+    is still stat'ed once: in-place edits change its size and mtime but not
+    the directory's mtime. Listings taken within 2 s of the directory's mtime
+    are never trusted.
+    """
+
+    def __init__(self, roots: List[str], fingerprint: str, state: str):
+        # Longest first, so nested include roots own their own subtrees
+        self.roots = sorted(roots, key=len, reverse=True)
+        self.fingerprint = fingerprint
+        self.state = state
+        # dir -> (dir mtime_ns, listed at ns, [(name, size, mtime_ns, dev, ino)], [subdir names])
+        self._dirs: Dict[str, tuple] = {}
+        self._seen: set = set()
+        self._lock = threading.Lock()
+        self.complete = False
+        self.dirs_listed = 0
+        self.dirs_skipped = 0
+
+    @classmethod
+    def load(cls, roots: List[str], fingerprint: str, state: str) -> "DirSnapshot":
+        snap = cls(roots, fingerprint, state)
+        for root in snap.roots:
+            try:
+                with open(root_state_path(state, root, SNAPSHOT_FILENAME), "r", encoding="utf-8") as f:
+                    blob = json.load(f)
+                if blob.get("version") != _VERSION or blob.get("fingerprint") != fingerprint:
+                    continue
+                for rel, rec in blob["dirs"].items():
+                    path = root if rel == "." else os.path.join(root, rel)
+                    snap._dirs[path] = tuple(rec)
+            except (OSError, ValueError, TypeError, AttributeError, KeyError):
+                # Missing or corrupt snapshot: those directories are simply listed
+                continue
+        return snap
+
+    def lookup(self, dirpath: str, mtime_ns: int, root: int = -1) -> Optional[Tuple[List[FileEntry], List[str]]]:
+        rec = self._dirs.get(dirpath)
+        if rec is None or rec[0] != mtime_ns or rec[1] - mtime_ns < RACY_NS:
+            return None
+        _mtime, _listed, files, subdirs = rec
+        with self._lock:
+            self._seen.add(dirpath)
+            self.dirs_skipped += 1
+        join = os.path.join
+        entries = []
+        for name, size, mtime, dev, ino in files:
+            # Current size and mtime; None if the file went away since the directory was stat'ed
+            entry = refresh_entry(FileEntry(join(dirpath, name), os.path.splitext(name)[1], size, mtime, dev, ino, root))
+            if entry is not None:
+                entries.append(entry)
+        return entries, [join(dirpath, name) for name in subdirs]
+
+    def record(self, dirpath: str, mtime_ns: int, files: List[FileEntry], subdirs: List[str]) -> None:
+        rec = (mtime_ns, time.time_ns(),
+               [(os.path.basename(e.path), e.size, e.mtime_ns, e.dev, e.ino) for e in files],
+               [os.path.basename(d) for d in subdirs])
+        with self._lock:
+            self._dirs[dirpath] = rec
+            self._seen.add(dirpath)
+            self.dirs_listed += 1
+
+    def save(self) -> None:
+        with self._lock:
+            # After a full walk, directories not visited any more are gone or now excluded
+            keep = self._seen if self.complete else self._dirs.keys()
+            per_root: Dict[str, Dict[str, list]] = {root: {} for root in self.roots}
+            for path in keep:
+                root = _root_of(path, self.roots)
+                if root is not None:
+                    rel = "." if path == root else os.path.relpath(path, root)
+                    per_root[root][rel] = list(self._dirs[path])
+        for root, dirs in per_root.items():
+            if not dirs or not os.path.isdir(root):
+                continue
+            target = root_state_path(self.state, root, SNAPSHOT_FILENAME)
+            tmp = target + ".tmp"
+            try:
+                os.makedirs(self.state, exist_ok=True)
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({"version": _VERSION, "fingerprint": self.fingerprint, "dirs": dirs},
+                              f, separators=(",", ":"))
+                os.replace(tmp, target)
+            except OSError:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+
+    def as_dict(self) -> dict:
+        return {"dirs_listed": self.dirs_listed, "dirs_skipped": self.dirs_skipped}
+
+    def summary(self) -> str:
+        return f"directories listed {self.dirs_listed}, unchanged (served from snapshot) {self.dirs_skipped}"
+
+
+def open_dir_snapshot(cfg: Dict, full_rescan: bool = False) -> Optional[DirSnapshot]:
+    """Snapshot for the configured include roots, or None when behavior.scan_snapshot is off.
+
+    ``full_rescan`` starts from an empty snapshot, so every directory is
+    listed again and the stored snapshot is rewritten.
+    """
+    if not cfg.get("behavior", {}).get("scan_snapshot", True):
+        return None
+    roots = [p for p in cfg.get("include_paths", []) if os.path.isdir(p)]
+    fingerprint = snapshot_fingerprint(cfg.get("exclude_globs", []),
+                                       cfg.get("ui", {}).get("show_hidden_files", False),
+                                       cfg.get("behavior", {}).get("sort_subfolders", True))
+    if full_rescan:
+        return DirSnapshot(roots, fingerprint, state_dir(cfg))
+    return DirSnapshot.load(roots, fingerprint, state_dir(cfg))
@@ -8,13 +8,31 @@ from datetime import datetime
 
 sys.path.append(os.getcwd())
 
+from src import instrument
 from src.config import load_config, get_default_config_path, save_config
-from src.preview import build_preview
+from src.plan import Plan, plan_fingerprint
+from src.plan_store import PlanStore
+from src.ui_pump import LogBuffer, StatusThrottle, UIPump
+from src.virtual_tree import VirtualTree
+from src.preview import PreviewItem, build_preview
+from src.dir_snapshot import open_dir_snapshot
+from src.utils.dedup import DedupStats
 from src.apply_moves import apply_moves, undo_all_stream
 from src.utils.os_ops import open_file
 from src.worker import StreamWorker, ApplyWorker
 
 
+def _fmt_size(n: int | None) -> str:
+    if n is None:
+        return ""
+    size = float(n)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} TB"
+
+
 class FileFlowGUI(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -105,7 +123,7 @@ class PreviewScreen(tk.Frame):
     def __init__(self, parent, app):
         super().__init__(parent, bg="#1e1e1e")
         self.app = app
-        self.all_rows = []
+        self.all_rows = PlanStore()
         self.compact_var = tk.BooleanVar(value=True)
 
         # Toolbar
@@ -120,6 +138,7 @@ class PreviewScreen(tk.Frame):
 
         self.dry_var = tk.BooleanVar(value=False)
         self.subfolders_var = tk.BooleanVar(value=self.app.cfg.get("behavior", {}).get("sort_subfolders", False))
+        self.full_rescan_var = tk.BooleanVar(value=False)
 
         def tb_btn(txt, cmd, bg):
             return tk.Button(
@@ -178,10 +197,20 @@ class PreviewScreen(tk.Frame):
             selectcolor="#2d2d2d",
         ).pack(side="left")
 
+        tk.Checkbutton(
+            left_tools,
+            text="Full rescan",
+            variable=self.full_rescan_var,
+            bg="#2d2d2d",
+            fg="white",
+            selectcolor="#2d2d2d",
+            activebackground="#2d2d2d",
+        ).pack(side="left", padx=5)
+
 
         tk.Checkbutton(
             left_tools,
-            text="Compact Mode (lower memory, no filtering)",
+            text="Compact Mode (no filtering)",
             variable=self.compact_var,
             command=self.on_compact_toggle,
             bg="#2d2d2d",
@@ -248,18 +277,25 @@ class PreviewScreen(tk.Frame):
         style.configure("Treeview.Heading", background="#007acc", foreground="white", font=("Segoe UI", 10, "bold"))
         style.map("Treeview", background=[("selected", "#005999")])
 
-        columns = ("src", "action", "dest")
-        self.tree = ttk.Treeview(main_area, columns=columns, show="headings")
+        self.show_sizes = bool(self.app.cfg.get("ui", {}).get("show_file_sizes", True))
+        columns = ("src", "action", "dest", "size")
+        self.tree = ttk.Treeview(main_area, columns=columns, show="headings",
+                                 displaycolumns=(columns if self.show_sizes else columns[:3]))
         for col in columns:
             self.tree.heading(col, text=col.title())
-        self.tree.column("src", width=600, anchor="w")
+        self.tree.column("src", width=600 if not self.show_sizes else 550, anchor="w")
         self.tree.column("action", width=100, anchor="center")
-        self.tree.column("dest", width=600, anchor="w")
+        self.tree.column("dest", width=600 if not self.show_sizes else 550, anchor="w")
+        self.tree.column("size", width=100, anchor="e")
         self.tree.grid(row=0, column=0, sticky="nsew")
 
-        yscroll = ttk.Scrollbar(main_area, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=yscroll.set)
+        yscroll = ttk.Scrollbar(main_area, orient="vertical")
         yscroll.grid(row=0, column=1, sticky="ns")
+        # Only the visible rows exist as Treeview items; they are filled from all_rows
+        self.vtree = VirtualTree(self.tree, yscroll, self._format_row)
+        self._shown = None
+        self._shown_action = None
+        self._shown_upto = 0
 
         self.log_text = tk.Text(main_area, bg="black", fg="lime", insertbackground="white", height=10)
         self.log_text.grid(row=1, column=0, columnspan=2, sticky="nsew")
@@ -278,45 +314,73 @@ class PreviewScreen(tk.Frame):
         self.status_var = tk.StringVar(value="Ready")
         self.status_label = tk.Label(status_bar, textvariable=self.status_var, bg="#2d2d2d", fg="white")
         self.status_label.pack(side="left", padx=8, pady=2)
-        # Display cap (limit number of rows shown to reduce memory)
-        self.display_row_cap = self.app.cfg.get("ui", {}).get("preview_window_limit", 1000)
+        # Progress status is coalesced to a few updates per second; the log is written in bulk
+        self._status = StatusThrottle(self.status_var.set, min_interval=0.25)
+        self._log_buf = LogBuffer(max_lines=1000)
+        self._log_flush_id = None
+        self._pump = None
+        self._preview_done = False
         # Background worker state
         self._q = None
         self._cancel = None
-        self._poll_id = None
         self._running_mode = None
         self._apply_worker = None
+        # Last preview, reused by apply while it is complete and the config is unchanged
+        self._plan = None
+        # Per-stage counters of the running operation when behavior.metrics is on
+        self._metrics = None
 
         self.bind_all("<F5>", lambda e: self.run_preview_async())
         self.bind_all("<Control-l>", lambda e: self.clear_log())
         self.bind_all("<Control-L>", lambda e: self.clear_log())
         self.bind_all("<Escape>", lambda e: self.cancel_current())
         self.tree.bind("<Double-1>", self._on_tree_double_click)
-        self.tree.bind("<Button-3>", self._on_tree_right_click)
+        self.tree.bind("<Button-3>", self._on_tree_right_click, add="+")
         self._make_context_menu()
 
+    def _start_metrics(self):
+        self._metrics = instrument.enable() if instrument.enabled_by(self.app.cfg) else None
+        return self._metrics
+
+    def _finish_metrics(self, log_summary: bool = True):
+        metrics, self._metrics = self._metrics, None
+        if metrics is None:
+            return
+        instrument.disable()
+        if log_summary:
+            self.log(f"[METRICS] {metrics.summary()}")
+        path = os.path.join(os.path.dirname(self.app.cfg_path), "last_run_metrics.json")
+        try:
+            metrics.dump(path)
+            self.log(f"[METRICS] saved to {path}")
+        except OSError as e:
+            self.log(f"[METRICS] could not save {path}: {e}")
+
     def set_status(self, msg: str):
-        self.status_var.set(msg)
+        self._status.set(msg, force=True)
 
     def clear_log(self):
+        self._log_buf.clear()
         self.log_text.delete("1.0", tk.END)
         self.log_text.see("1.0")
 
     def on_compact_toggle(self):
         self.filter_menu.configure(state="readonly" if not self.compact_var.get() else "disabled")
         if self.compact_var.get():
-            self.log("[UI] Compact Mode ON: filtering disabled to save memory")
+            self.log("[UI] Compact Mode ON: filtering disabled")
         else:
-            self.log("[UI] Compact Mode OFF: filtering enabled (higher memory)")
+            self.log("[UI] Compact Mode OFF: filtering enabled")
 
     def log(self, msg):
+        # Safe from worker threads: lines are buffered and written by the Tk thread
         ts = datetime.now().strftime("[%H:%M:%S]")
-        self.log_text.insert(tk.END, f"{ts} {msg}\n")
-        max_lines = 1000
-        current = int(float(self.log_text.index('end-1c').split('.')[0]))
-        if current > max_lines:
-            self.log_text.delete('1.0', f'{current - max_lines}.0')
-        self.log_text.see(tk.END)
+        self._log_buf.append(f"{ts} {msg}")
+        if self._log_flush_id is None and threading.current_thread() is threading.main_thread():
+            self._log_flush_id = self.after_idle(self._flush_log)
+
+    def _flush_log(self):
+        self._log_flush_id = None
+        self._log_buf.flush(self.log_text)
 
     def toggle_subfolders(self):
         self.app.cfg.setdefault("behavior", {})
@@ -353,25 +417,26 @@ class PreviewScreen(tk.Frame):
         self._ctx_menu.add_command(label="Copy Selected Paths", command=self._ctx_copy_paths)
 
     def _on_tree_right_click(self, event):
-        iid = self.tree.identify_row(event.y)
-        if iid:
-            self.tree.selection_set(iid)
+        # VirtualTree has already updated the selection for this click
+        if self.tree.identify_row(event.y):
             self._ctx_menu.tk_popup(event.x_root, event.y_root)
 
     def _ctx_open_source_file(self):
-        sel = self.tree.selection()
-        if not sel:
+        # The row that was right-clicked, even within a larger selection
+        iid = self.tree.focus()
+        if not iid:
             return
-        src, _, _ = self.tree.item(sel, "values")
+        src = self.tree.item(iid, "values")[0]
         open_file(src)
 
     def _ctx_copy_paths(self):
-        sels = self.tree.selection()
-        if not sels:
+        # Selection is kept per row, including rows scrolled out of view
+        rows = self.vtree.selected_rows()
+        if not rows:
             return
         lines = []
-        for iid in sels:
-            src, action, dest = self.tree.item(iid, "values")
+        for row in rows:
+            src, action, dest, _entry = self.all_rows[row]
             lines.append(f"{action}\t{src}\t{dest}")
         text = "\n".join(lines)
         self.clipboard_clear()
@@ -379,17 +444,17 @@ class PreviewScreen(tk.Frame):
         self.log("[UI] Copied selected paths to clipboard")
 
     def _ctx_open_dest_folder(self):
-        sel = self.tree.selection()
-        if not sel:
+        iid = self.tree.focus()
+        if not iid:
             return
-        _, _, dest = self.tree.item(sel, "values")
+        dest = self.tree.item(iid, "values")[2]
         open_file(os.path.dirname(dest))
 
     def _on_tree_double_click(self, event):
         iid = self.tree.identify_row(event.y)
         if not iid:
             return
-        src, _, _ = self.tree.item(iid, "values")
+        src = self.tree.item(iid, "values")[0]
         open_file(os.path.dirname(src))
 
     def run_preview_async(self):
@@ -407,70 +472,84 @@ class PreviewScreen(tk.Frame):
             return
 
         # Reset UI
-        self.tree.delete(*self.tree.get_children())
         self.clear_log()
-        self.all_rows.clear()
         self.toggle_subfolders()
 
         # Counters
         self._move_c = self._skip_c = self._conflict_c = self._total = 0
 
         # Setup streaming worker
-        self._q = queue.Queue(maxsize=500)
+        # Bounded in chunks; each holds up to StreamWorker's chunk_size items
+        self._q = queue.Queue(maxsize=64)
         self._cancel = threading.Event()
 
+        self._dedup_stats = DedupStats()
+        self._scan_snapshot = snapshot = open_dir_snapshot(self.app.cfg, bool(self.full_rescan_var.get()))
+        self._start_metrics()
+        self._plan = plan = Plan(plan_fingerprint(self.app.cfg))
+        # Rows are packed in the plan itself; the view and the filter read them from there
+        self.all_rows = plan.items
+        self._set_view()
+
         def gen():
-            return build_preview(self.app.cfg)
+            return plan.record(build_preview(self.app.cfg, self._dedup_stats, snapshot))
 
         worker = StreamWorker(target=gen, out_q=self._q, cancel_event=self._cancel)
         worker.start()
 
         self._set_running("preview")
         self.set_status("Scanning… 0 items")
-        self._poll_queue_preview()
+        self._preview_done = False
+        self._pump = UIPump(self, self._drain_preview, budget_ms=8.0, on_tick=self._preview_tick)
+        self._pump.start()
 
-    def _poll_queue_preview(self):
+    def _drain_preview(self, limit: int):
         processed = 0
         try:
-            while processed < 200:
+            while processed < limit:
                 item = self._q.get_nowait()
                 if item is None:
-                    self._finish_preview()
-                    return
-                if isinstance(item, tuple) and len(item) == 3:
-                    src, action, dest = item
-                    if not self.compact_var.get():
-                        self.all_rows.append((src, action, dest))
-                    self.tree.insert("", tk.END, values=(src, action, dest), tags=(action,))
-                    # Enforce display cap
-                    if self.display_row_cap and len(self.tree.get_children()) > self.display_row_cap:
-                        to_remove = len(self.tree.get_children()) - self.display_row_cap
-                        for iid in self.tree.get_children()[:to_remove]:
-                            self.tree.delete(iid)
-                    self.log(f"{action}: {src} -> {dest}")
-                    self._total += 1
-                    if action == "MOVE":
-                        self._move_c += 1
-                    elif action == "SKIP":
-                        self._skip_c += 1
-                    elif action == "CONFLICT":
-                        self._conflict_c += 1
-                    self.set_status(f"Scanning… {self._total} items (MOVE {self._move_c} | SKIP {self._skip_c} | CONFLICT {self._conflict_c})")
+                    self._preview_done = True
+                    return processed, True
+                if isinstance(item, list):
+                    # A whole chunk of PreviewItems; the rows themselves are already in all_rows
+                    for row in item:
+                        action = row.action
+                        if action == "MOVE":
+                            self._move_c += 1
+                        elif action == "SKIP":
+                            self._skip_c += 1
+                        elif action == "CONFLICT":
+                            self._conflict_c += 1
+                    self._total += len(item)
+                    processed += len(item)
                 elif isinstance(item, tuple) and item and item[0] == "__ERROR__":
                     self.log(f"[ERROR] {item[1]}")
-                processed += 1
+                    processed += 1
         except queue.Empty:
             pass
-        self._poll_id = self.after(50, self._poll_queue_preview)
+        return processed, False
+
+    def _preview_tick(self):
+        self._refresh_view()
+        status = f"Scanning… {self._total} items (MOVE {self._move_c} | SKIP {self._skip_c} | CONFLICT {self._conflict_c})"
+        if self._metrics is not None:
+            status += f" | {self._metrics.summary()}"
+        self._status.set(status)
+        self._flush_log()
+        if self._preview_done:
+            self._finish_preview()
 
     def _finish_preview(self):
-        if self._poll_id:
-            try:
-                self.after_cancel(self._poll_id)
-            except Exception:
-                pass
-            self._poll_id = None
+        if self._pump is not None:
+            self._pump.stop()
+            self._pump = None
         self.on_compact_toggle()
+        if self._scan_snapshot is not None:
+            self.log(f"[SCAN] {self._scan_snapshot.summary()}")
+        if self._dedup_stats.compared:
+            self.log(f"[DEDUP] {self._dedup_stats.summary()}")
+        self._finish_metrics()
         messagebox.showinfo(
             "Preview Complete",
             f"Found {self._total} items\nMOVE {self._move_c}, SKIP {self._skip_c}, CONFLICT {self._conflict_c}",
@@ -481,14 +560,33 @@ class PreviewScreen(tk.Frame):
         self._q = None
         self._cancel = None
 
+    def _format_row(self, item: PreviewItem):
+        src, action, dest, entry = item
+        size = _fmt_size(entry.size) if entry is not None else ""
+        return (src, action, dest, size), (action,)
+
+    def _set_view(self):
+        selected = self.filter_var.get()
+        if self.compact_var.get() or selected == "All":
+            self._shown = self._shown_action = None
+        else:
+            self._shown_action = selected
+            self._shown_upto = len(self.all_rows)
+            self._shown = self.all_rows.indices(selected, 0, self._shown_upto)
+        self.vtree.set_rows(self.all_rows, self._shown)
+
+    def _refresh_view(self):
+        if self._shown is not None:
+            # Pick up matching rows appended since the filter was set
+            n = len(self.all_rows)
+            self._shown.extend(self.all_rows.indices(self._shown_action, self._shown_upto, n))
+            self._shown_upto = n
+        self.vtree.refresh()
+
     def apply_filter(self):
         if self.compact_var.get():
             return
-        self.tree.delete(*self.tree.get_children())
-        selected = self.filter_var.get()
-        for src, action, dest in self.all_rows:
-            if selected == "All" or action == selected:
-                self.tree.insert("", tk.END, values=(src, action, dest), tags=(action,))
+        self._set_view()
 
     def sort_now_async(self):
         if self._running_mode:
@@ -507,16 +605,30 @@ class PreviewScreen(tk.Frame):
 
         self._cancel = threading.Event()
 
+        plan = self._plan if self._plan is not None and self._plan.matches(self.app.cfg) else None
+        if not dry:
+            # Files are about to move; the next apply needs a fresh preview.
+            # A dry run moves nothing, so its plan stays valid for the real apply
+            self._plan = None
+        if plan is not None:
+            self.log(f"Reusing preview plan ({len(plan)} items)")
+
+        full_rescan = bool(self.full_rescan_var.get())
+
         def iter_factory():
-            return build_preview(self.app.cfg)
+            if plan is not None:
+                return iter(plan)
+            return build_preview(self.app.cfg, snapshot=open_dir_snapshot(self.app.cfg, full_rescan))
 
         def apply_wrapper(stream):
-            apply_moves(stream, self.app.cfg, dry_run=dry)
+            apply_moves(stream, self.app.cfg, dry_run=dry, cancel_event=self._cancel)
 
         def progress(msg: str):
             self.log(msg)
 
-        worker = ApplyWorker(preview_iter_fn=iter_factory, apply_fn=apply_wrapper, cancel_event=self._cancel, progress_cb=progress)
+        metrics = self._start_metrics()
+        worker = ApplyWorker(preview_iter_fn=iter_factory, apply_fn=apply_wrapper, cancel_event=self._cancel,
+                             progress_cb=progress, metrics=metrics)
         self._apply_worker = worker
         worker.start()
 
@@ -524,7 +636,11 @@ class PreviewScreen(tk.Frame):
         self._poll_apply_done()
 
     def _poll_apply_done(self):
+        # Progress lines logged by the worker thread
+        self._flush_log()
         if self._apply_worker and self._apply_worker.done_event.is_set():
+            # The worker already logged the summary through progress_cb
+            self._finish_metrics(log_summary=False)
             self.log("=== SORT COMPLETE ===")
             messagebox.showinfo("Sort Complete", "Done.")
             self.set_status("Apply complete")
@@ -533,6 +649,8 @@ class PreviewScreen(tk.Frame):
             self._apply_worker = None
             self._cancel = None
             return
+        if self._metrics is not None:
+            self._status.set(f"Applying… {self._metrics.summary()}")
         self.after(150, self._poll_apply_done)
 
     def undo_dialog(self):
@@ -0,0 +1,125 @@
+"""Per-stage counters and timings for preview and apply runs.
+
+Off by default: ``current()`` returns None and instrumented code skips all
+bookkeeping after that one check, so hot loops fetch it once up front.
+``enable()`` installs one process-wide Metrics that every thread (scan,
+hash and apply pools, GUI workers) records into.
+
+Stage timings are wall-clock sums over all threads and may nest
+(``scan.list`` includes ``scan.exclude``), so they can exceed the run's
+elapsed time.
+"""
+import json
+import threading
+import time
+from typing import Dict, Optional
+
+
+class Metrics:
+    """Counters and cumulative stage timings for one run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._counters: Dict[str, int] = {}
+        # stage -> [seconds, calls]
+        self._stages: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def count(self, name: str, n: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def add_time(self, stage: str, seconds: float, calls: int = 1) -> None:
+        with self._lock:
+            rec = self._stages.get(stage)
+            if rec is None:
+                self._stages[stage] = [seconds, calls]
+            else:
+                rec[0] += seconds
+                rec[1] += calls
+
+    def timer(self, stage: str) -> "_Timer":
+        return _Timer(self, stage)
+
+    def merge(self, prefix: str, counters: Dict) -> None:
+        """Fold in a stats object's numeric counters (``DedupStats.as_dict()`` and the like)."""
+        with self._lock:
+            for name, value in counters.items():
+                if isinstance(value, dict):
+                    for sub, v in value.items():
+                        if isinstance(v, int):
+                            key = f"{prefix}.{name}.{sub}"
+                            self._counters[key] = self._counters.get(key, 0) + v
+                elif isinstance(value, int) and not isinstance(value, bool):
+                    key = f"{prefix}.{name}"
+                    self._counters[key] = self._counters.get(key, 0) + value
+
+    def get(self, name: str) -> int:
+        return self._counters.get(name, 0)
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "elapsed": round(time.perf_counter() - self.started, 6),
+                "counters": dict(sorted(self._counters.items())),
+                "stages": {k: {"seconds": round(s, 6), "calls": n} for k, (s, n) in sorted(self._stages.items())},
+            }
+
+    def summary(self) -> str:
+        """One line for the status bar: stage times, then the main counters."""
+        with self._lock:
+            stages = sorted(self._stages.items(), key=lambda kv: -kv[1][0])
+            counters = dict(self._counters)
+        parts = [f"{name} {secs:.2f}s" for name, (secs, _n) in stages[:5]]
+        for key, label in (("scan.dirs_listed", "dirs"), ("scan.dirs_skipped", "dirs cached"),
+                           ("scan.files", "files"), ("hash.bytes", "hashed"),
+                           ("apply.moved", "moved"), ("journal.entries_written", "journaled")):
+            if key in counters:
+                value = counters[key]
+                parts.append(f"{label} {value / (1024 * 1024):.1f} MiB" if key == "hash.bytes" else f"{label} {value}")
+        return " | ".join(parts) if parts else "no activity"
+
+    def dump(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(), f, indent=2)
+
+
+class _Timer:
+    __slots__ = ("_metrics", "_stage", "_t0")
+
+    def __init__(self, metrics: Metrics, stage: str):
+        self._metrics = metrics
+        self._stage = stage
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._metrics.add_time(self._stage, time.perf_counter() - self._t0)
+        return False
+
+
+_current: Optional[Metrics] = None
+
+
+def current() -> Optional[Metrics]:
+    return _current
+
+
+def enable(metrics: Optional[Metrics] = None) -> Metrics:
+    """Start recording into ``metrics`` (a fresh one by default) and return it."""
+    global _current
+    _current = metrics or Metrics()
+    return _current
+
+
+def disable() -> Optional[Metrics]:
+    """Stop recording; returns what was recorded."""
+    global _current
+    metrics, _current = _current, None
+    return metrics
+
+
+def enabled_by(cfg: Dict) -> bool:
+    return bool(cfg.get("behavior", {}).get("metrics", False))
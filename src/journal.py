@@ -0,0 +1,225 @@
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Dict, Generator, List, Optional
+
+JOURNAL_NAME = ".fileflow_journal.jsonl"
+INDEX_SUFFIX = ".idx"
+_READ_BLOCK = 64 * 1024
+
+
+def journal_path(cfg: Dict) -> str:
+    return os.path.join(cfg["include_paths"][0], JOURNAL_NAME)
+
+
+def index_path(journal_file: str) -> str:
+    """Side index: one line per batch with its byte offset, length and entry count."""
+    return journal_file + INDEX_SUFFIX
+
+
+def _now_iso() -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+
+class JournalWriter:
+    """Write-ahead journal for one apply batch.
+
+    The file stays open for the whole batch. Moves are recorded as intents in
+    a buffer; ``commit`` writes and flushes the buffer and must be called
+    before any of those moves runs, so no move can complete without a record
+    on disk. A move that then fails is cancelled with a ``failed`` marker.
+
+    On close the batch's byte range is appended to the side index so undo
+    can seek straight to it.
+
+    Durability: the buffer is always flushed to the OS on ``commit`` (safe
+    against a process crash). ``fsync`` additionally runs after every
+    ``fsync_every`` entries and/or ``fsync_interval_ms`` milliseconds, and
+    always on ``close``; with both at 0 it only runs at the end of the batch.
+
+    Recording, failure markers and commits are thread-safe.
+    """
+
+    def __init__(self, path: str, fsync_every: int = 0, fsync_interval_ms: int = 0):
+        self.path = path
+        self.batch = uuid.uuid4().hex
+        self.fsync_every = fsync_every
+        self.fsync_interval_ms = fsync_interval_ms
+        self._buf: List[str] = []
+        self._seq = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self.entries_written = 0
+        self.bytes_written = 0
+        self.fsyncs = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._f = open(path, "ab")
+        self._f.seek(0, os.SEEK_END)
+        self.offset = self._f.tell()
+
+    def record(self, src_before: str, dest_after: str) -> int:
+        """Buffer a move intent and return its sequence number within the batch."""
+        with self._lock:
+            self._seq += 1
+            self._buf.append(json.dumps({
+                "src_before": src_before,
+                "dest_after": dest_after,
+                "time": _now_iso(),
+                "batch": self.batch,
+                "seq": self._seq,
+            }) + "\n")
+            return self._seq
+
+    def mark_failed(self, seq: int) -> None:
+        """Cancel an intent whose move did not happen (written on the next commit)."""
+        line = json.dumps({"batch": self.batch, "seq": seq, "failed": True}) + "\n"
+        with self._lock:
+            self._buf.append(line)
+
+    @property
+    def pending(self) -> int:
+        return len(self._buf)
+
+    def commit(self) -> None:
+        with self._lock:
+            self._commit()
+
+    def _commit(self) -> None:
+        if self._buf:
+            data = "".join(self._buf).encode("utf-8")
+            self._f.write(data)
+            self._f.flush()
+            self.bytes_written += len(data)
+            self._unsynced += len(self._buf)
+            self.entries_written += len(self._buf)
+            self._buf.clear()
+        if not self._unsynced:
+            return
+        due = self.fsync_every and self._unsynced >= self.fsync_every
+        if not due and self.fsync_interval_ms:
+            due = (time.monotonic() - self._last_sync) * 1000 >= self.fsync_interval_ms
+        if due:
+            self._sync()
+
+    def _sync(self) -> None:
+        os.fsync(self._f.fileno())
+        self.fsyncs += 1
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        try:
+            with self._lock:
+                self._commit()
+                if self._unsynced:
+                    self._sync()
+        finally:
+            self._f.close()
+        if self._seq:
+            self._write_index()
+
+    def _write_index(self) -> None:
+        line = json.dumps({
+            "batch": self.batch,
+            "offset": self.offset,
+            "length": self.bytes_written,
+            "count": self._seq,
+            "time": _now_iso(),
+        }) + "\n"
+        try:
+            with open(index_path(self.path), "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError:
+            # The index is only an accelerator; undo falls back to scanning
+            pass
+
+    def __enter__(self) -> "JournalWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_journal(cfg: Dict) -> JournalWriter:
+    beh = cfg.get("behavior", {})
+    return JournalWriter(journal_path(cfg),
+                         fsync_every=int(beh.get("journal_fsync_every", 0) or 0),
+                         fsync_interval_ms=int(beh.get("journal_fsync_interval_ms", 0) or 0))
+
+
+def iter_lines_reversed(path: str, start: int = 0, end: Optional[int] = None,
+                        block: int = _READ_BLOCK) -> Generator[bytes, None, None]:
+    """Yield the lines of ``path[start:end]`` last to first, reading backwards in blocks.
+
+    Memory use is bounded by the block size plus the longest line.
+    """
+    with open(path, "rb") as f:
+        if end is None:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+        pos = end
+        tail = b""
+        while pos > start:
+            size = min(block, pos - start)
+            pos -= size
+            f.seek(pos)
+            data = f.read(size) + tail
+            lines = data.split(b"\n")
+            # The first piece may be the end of a line that starts in an earlier block
+            tail = lines[0]
+            for line in reversed(lines[1:]):
+                if line.strip():
+                    yield line
+        if tail.strip():
+            yield tail
+
+
+def iter_entries_reversed(path: str, start: int = 0, end: Optional[int] = None) -> Generator[Dict, None, None]:
+    for raw in iter_lines_reversed(path, start, end):
+        try:
+            entry = json.loads(raw)
+        except ValueError:
+            continue
+        if isinstance(entry, dict):
+            yield entry
+
+
+def last_batch_range(journal_file: str) -> Optional[Dict]:
+    """Index record of the newest batch, if the index agrees with the journal's size."""
+    idx = index_path(journal_file)
+    try:
+        size = os.path.getsize(journal_file)
+        for raw in iter_lines_reversed(idx):
+            rec = json.loads(raw)
+            if rec.get("offset", -1) + rec.get("length", -1) == size:
+                return rec
+            return None
+    except (OSError, ValueError, AttributeError):
+        pass
+    return None
+
+
+def iter_last_batch_reversed(journal_file: str) -> Generator[Dict, None, None]:
+    """Entries (intents and markers) of the newest batch, last to first.
+
+    Seeks via the side index when it is consistent. Otherwise it scans backwards
+    from the end of the journal while entries belong to the newest batch;
+    legacy entries without a batch id are grouped by their timestamp.
+    """
+    rec = last_batch_range(journal_file)
+    if rec is not None:
+        yield from iter_entries_reversed(journal_file, rec["offset"], rec["offset"] + rec["length"])
+        return
+    target = None
+    for entry in iter_entries_reversed(journal_file):
+        key = ("batch", entry["batch"]) if entry.get("batch") else ("time", entry.get("time"))
+        if target is None:
+            target = key
+        elif key != target:
+            return
+        yield entry
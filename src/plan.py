@@ -0,0 +1,84 @@
+import hashlib
+import json
+from typing import Dict, Generator, Iterable, Iterator, Optional
+from .plan_store import PlanStore
+from .preview import Planner, PreviewItem, build_preview
+from .scanner import refresh_entry
+from .utils.dedup import DedupStats
+
+
+def plan_fingerprint(cfg: Dict) -> str:
+    """Digest of every config value that can change what a preview plans."""
+    payload = {
+        "include_paths": cfg.get("include_paths", []),
+        "destination_roots": cfg.get("destination_roots", []),
+        "exclude_globs": cfg.get("exclude_globs", []),
+        "rules": cfg.get("rules", {}) or {},
+        "custom_rules": cfg.get("custom_rules", []) or [],
+        "behavior": cfg.get("behavior", {}),
+        "show_hidden_files": cfg.get("ui", {}).get("show_hidden_files", False),
+    }
+    blob = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(blob.encode("utf-8")).hexdigest()
+
+
+class Plan:
+    """The materialized result of one preview, executable by apply.
+
+    A plan is only reusable once ``record`` ran the preview to the end and
+    while the config still has the fingerprint it was built with.
+    """
+
+    def __init__(self, fingerprint: str):
+        self.fingerprint = fingerprint
+        self.items = PlanStore()
+        self.complete = False
+
+    def record(self, stream: Iterable[PreviewItem]) -> Generator[PreviewItem, None, None]:
+        """Pass ``stream`` through while keeping every item."""
+        for item in stream:
+            self.items.append(item)
+            yield item
+        self.complete = True
+
+    def matches(self, cfg: Dict) -> bool:
+        return self.complete and self.fingerprint == plan_fingerprint(cfg)
+
+    def __iter__(self) -> Iterator[PreviewItem]:
+        return iter(self.items)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+def build_plan(cfg: Dict, stats: Optional[DedupStats] = None) -> Plan:
+    plan = Plan(plan_fingerprint(cfg))
+    for _ in plan.record(build_preview(cfg, stats)):
+        pass
+    return plan
+
+
+def revalidate(items: Iterable[PreviewItem], cfg: Dict, stats: Optional[DedupStats] = None,
+               caches=None) -> Generator[PreviewItem, None, None]:
+    """Re-check each planned source with one stat before it is applied.
+
+    Unchanged items pass through as planned. Files that changed since the
+    preview are planned again against the current disk state; files that
+    disappeared come back with the ``MISSING`` action.
+    """
+    planner = None
+    for item in items:
+        entry = item.entry
+        # Files already in their folder have nothing to revalidate
+        if entry is None or item.dest == item.src:
+            yield item
+            continue
+        fresh = refresh_entry(entry)
+        if fresh is entry:
+            yield item
+        elif fresh is None:
+            yield PreviewItem(item.src, "MISSING", item.src, None)
+        else:
+            if planner is None:
+                planner = Planner(cfg, stats, caches)
+            yield planner.replan(fresh)
@@ -0,0 +1,138 @@
+import os
+from array import array
+from typing import Dict, Iterator, List, Optional
+from .preview import PreviewItem
+from .scanner import FileEntry
+
+ACTIONS = ("MOVE", "SKIP", "CONFLICT", "MISSING")
+_ACTION_CODE = {name: code for code, name in enumerate(ACTIONS)}
+_ACTION_MASK = 0x0F
+_HAS_ENTRY = 0x10
+# Destination file name differs from the source one (e.g. a suffixed name)
+_RENAMED = 0x20
+_SEP = b"\0"
+
+
+class PlanStore:
+    """Preview rows packed into flat arrays.
+
+    Directory prefixes are interned once and rows refer to them by id. The
+    action is a small integer code, the file names of a row are one slice of
+    a shared UTF-8 buffer (the destination name only when it differs) and the
+    stat fields of the scanned entry live in typed arrays. Rows come back as
+    ``PreviewItem`` values, rebuilt on access.
+
+    Appends from one thread may run while another thread reads: a row is
+    only counted once all of its fields are stored.
+    """
+
+    def __init__(self):
+        self._dirs: List[str] = []
+        self._dir_ids: Dict[str, int] = {}
+        self._src_dir = array("I")
+        self._dest_dir = array("I")
+        self._flags = array("B")
+        self._name_off = array("Q")
+        self._names = bytearray()
+        self._size = array("q")
+        self._mtime_ns = array("q")
+        self._dev = array("Q")
+        self._ino = array("Q")
+        self._count = 0
+
+    def _dir_id(self, path: str) -> int:
+        did = self._dir_ids.get(path)
+        if did is None:
+            did = self._dir_ids[path] = len(self._dirs)
+            self._dirs.append(path)
+        return did
+
+    def append(self, item: PreviewItem) -> None:
+        src, action, dest, entry = item
+        src_dir, src_name = os.path.split(src)
+        dest_dir, dest_name = os.path.split(dest)
+        flags = _ACTION_CODE[action]
+        self._name_off.append(len(self._names))
+        self._names += src_name.encode("utf-8", "surrogateescape")
+        if dest_name != src_name:
+            flags |= _RENAMED
+            self._names += _SEP + dest_name.encode("utf-8", "surrogateescape")
+        self._src_dir.append(self._dir_id(src_dir))
+        self._dest_dir.append(self._dir_id(dest_dir))
+        if entry is not None:
+            flags |= _HAS_ENTRY
+            self._size.append(entry.size)
+            self._mtime_ns.append(entry.mtime_ns)
+            self._dev.append(entry.dev)
+            self._ino.append(entry.ino)
+        else:
+            self._size.append(-1)
+            self._mtime_ns.append(0)
+            self._dev.append(0)
+            self._ino.append(0)
+        self._flags.append(flags)
+        self._count += 1
+
+    def extend(self, items) -> None:
+        for item in items:
+            self.append(item)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _row_names(self, i: int):
+        start = self._name_off[i]
+        # The next row's offset is stored before its names, so this holds during appends
+        end = self._name_off[i + 1] if i + 1 < len(self._name_off) else len(self._names)
+        raw = self._names[start:end]
+        if self._flags[i] & _RENAMED:
+            src_raw, dest_raw = raw.split(_SEP, 1)
+            src_name = src_raw.decode("utf-8", "surrogateescape")
+            return src_name, dest_raw.decode("utf-8", "surrogateescape")
+        name = raw.decode("utf-8", "surrogateescape")
+        return name, name
+
+    def action(self, i: int) -> str:
+        return ACTIONS[self._flags[i] & _ACTION_MASK]
+
+    def size(self, i: int) -> Optional[int]:
+        return self._size[i] if self._flags[i] & _HAS_ENTRY else None
+
+    def __getitem__(self, i: int) -> PreviewItem:
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("plan row out of range")
+        flags = self._flags[i]
+        src_name, dest_name = self._row_names(i)
+        src = os.path.join(self._dirs[self._src_dir[i]], src_name)
+        dest = os.path.join(self._dirs[self._dest_dir[i]], dest_name)
+        entry = None
+        if flags & _HAS_ENTRY:
+            entry = FileEntry(src, os.path.splitext(src_name)[1], self._size[i], self._mtime_ns[i],
+                              self._dev[i], self._ino[i])
+        return PreviewItem(src, ACTIONS[flags & _ACTION_MASK], dest, entry)
+
+    def __iter__(self) -> Iterator[PreviewItem]:
+        for i in range(self._count):
+            yield self[i]
+
+    def indices(self, action: Optional[str] = None, start: int = 0, stop: Optional[int] = None) -> array:
+        """Row numbers in ``[start, stop)`` with ``action`` (all rows when None), as an unsigned int array."""
+        n = self._count if stop is None else min(stop, self._count)
+        if action is None:
+            return array("I", range(start, n))
+        code = _ACTION_CODE[action]
+        flags = self._flags
+        return array("I", (i for i in range(start, n) if flags[i] & _ACTION_MASK == code))
+
+    def filter(self, action: Optional[str] = None) -> Iterator[PreviewItem]:
+        for i in self.indices(action):
+            yield self[i]
+
+    def count(self, action: str) -> int:
+        code = _ACTION_CODE[action]
+        return sum(1 for f in self._flags[:self._count] if f & _ACTION_MASK == code)
+
+    def clear(self) -> None:
+        self.__init__()
@@ -1,91 +1,235 @@
 import os
-from typing import Dict, Generator, Tuple
-from .scanner import scan_paths
-from .rules import resolve_for_file
-from .utils.hash_utils import file_hash
-
-PreviewItem = Tuple[str, str, str]
-
-def _match_base_dir_for(src_path: str, include_paths: list[str]) -> str | None:
-    src_abs = os.path.abspath(src_path)
-    best = None
-    for base in include_paths:
-        base_abs = os.path.abspath(base)
-        if src_abs.startswith(base_abs.rstrip(os.sep) + os.sep) or src_abs == base_abs:
-            if best is None or len(base_abs) > len(os.path.abspath(best)):
-                best = base
-    return best
-
-import re
-_SUFFIX_RE = re.compile(r"^(?P<base>.*) \((?P<num>\d+)\)$")
-
-def _next_suffixed_name(path: str) -> str:
-    ddir, fname = os.path.split(path)
-    base, ext = os.path.splitext(fname)
-    m = _SUFFIX_RE.match(base)
-    if m:
-        base_core = m.group("base")
-        n = int(m.group("num")) + 1
-        new_base = f"{base_core} ({n})"
-    else:
-        new_base = f"{base} (1)"
-    return os.path.join(ddir, new_base + ext)
-
-def _suffix_path_chain(dest_path: str, proposed: set) -> str:
-    candidate = _next_suffixed_name(dest_path)
-    while os.path.exists(candidate) or candidate in proposed:
-        candidate = _next_suffixed_name(candidate)
-    return candidate
-
-def build_preview(cfg: Dict) -> Generator[PreviewItem, None, None]:
-    include_paths = cfg.get("include_paths", [])
-    exclude_patterns = cfg.get("exclude_globs", [])
-    include_hidden = cfg.get("ui", {}).get("show_hidden_files", False)
-    include_subfolders = cfg.get("behavior", {}).get("sort_subfolders", True)
-    policy = cfg.get("behavior", {}).get("conflict_policy", "suffix").lower()
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Generator, NamedTuple, Optional
+from . import instrument
+from .scanner import FileEntry, scan_entries
+from .dir_snapshot import DirSnapshot, open_dir_snapshot
+from .dest_index import DestIndex
+from .rules import get_resolver, resolve_for_file
+from .utils.hash_cache import open_hash_caches
+from .utils.dedup import DedupStats, files_identical
+from .utils.hash_utils import hash_algorithm
+from .utils.os_ops import stat_or_none
 
-    proposed: set[str] = set()
 
-    for src_path, ext in scan_paths(include_paths, exclude_patterns, include_hidden, include_subfolders):
-        dest_folder_name = resolve_for_file(ext, cfg)
+class PreviewItem(NamedTuple):
+    src: str
+    action: str
+    dest: str
+    entry: Optional[FileEntry] = None
 
-        current_folder = os.path.basename(os.path.dirname(src_path)).lower()
-        if current_folder == dest_folder_name.lower():
-            yield src_path, "SKIP", src_path
-            continue
-
-        base_root = _match_base_dir_for(src_path, include_paths) or (include_paths[0] if include_paths else "")
-        dest_roots = cfg.get("destination_roots", [])
-        try:
-            idx = include_paths.index(base_root)
-        except ValueError:
-            idx = 0
-        dest_base_dir = (dest_roots[idx] if idx < len(dest_roots) and dest_roots[idx] else base_root)
-
-        dest_path = os.path.join(dest_base_dir, dest_folder_name, os.path.basename(src_path))
-
-        if os.path.abspath(src_path) == os.path.abspath(dest_path):
-            yield src_path, "SKIP", dest_path
-            continue
-
-        # Conflict handling
-        if os.path.exists(dest_path) or dest_path in proposed:
-            # if same hash, skip as duplicate
+
+def _suffix_path_chain(dest_path: str, index: DestIndex) -> str:
+    return index.allocate_suffix(dest_path)
+
+class _Pending:
+    """A planned move whose conflict outcome is decided in scan order."""
+
+    __slots__ = ("entry", "dest_path", "dest_exists", "dup")
+
+    def __init__(self, entry: FileEntry, dest_path: str, dest_exists: bool, dup):
+        self.entry = entry
+        self.dest_path = dest_path
+        self.dest_exists = dest_exists
+        # bool, or a Future[bool] while the comparison runs on the hash pool
+        self.dup = dup
+
+    def ready(self) -> bool:
+        return not isinstance(self.dup, Future) or self.dup.done()
+
+    def is_duplicate(self) -> bool:
+        if isinstance(self.dup, Future):
             try:
-                if os.path.exists(dest_path):
-                    if file_hash(src_path) == file_hash(dest_path):
-                        yield src_path, "SKIP", dest_path  # duplicate same content
-                        continue
+                return self.dup.result()
             except Exception:
                 # If hashing fails
-                pass
+                return False
+        return self.dup
 
-            if policy == "suffix":
-                final_dest = _suffix_path_chain(dest_path, proposed)
-                proposed.add(final_dest)
-                yield src_path, "MOVE", final_dest
-            else:
-                yield src_path, "CONFLICT", dest_path
+
+def _compare(src_path: str, dest_path: str, entry: FileEntry, dest_st, cache, stats, algo) -> bool:
+    metrics = instrument.current()
+    t0 = time.perf_counter() if metrics is not None else 0.0
+    try:
+        return files_identical(src_path, dest_path, entry, dest_st, cache, stats, algo)
+    except Exception:
+        return False
+    finally:
+        if metrics is not None:
+            metrics.add_time("plan.compare", time.perf_counter() - t0)
+
+
+class Planner:
+    """Plans the action for scanned files against one destination index.
+
+    ``plan`` does the per-file work (rule lookup, destination existence,
+    content comparison, possibly on ``pool``); ``decide`` settles conflicts
+    and must be called in scan order. ``replan`` does both for one entry.
+    """
+
+    def __init__(self, cfg: Dict, stats: Optional[DedupStats] = None, caches=None,
+                 pool: Optional[ThreadPoolExecutor] = None):
+        self.cfg = cfg
+        self.stats = stats
+        self.caches = caches
+        self.pool = pool
+        self.include_paths = cfg.get("include_paths", [])
+        self.dest_roots = cfg.get("destination_roots", [])
+        # Per include path: (root, destination base); the absolute roots longest first for fallback matching
+        self._bases = [(root, self._dest_base(i, root)) for i, root in enumerate(self.include_paths)]
+        self._by_length = sorted(((os.path.abspath(root), i) for i, root in enumerate(self.include_paths)),
+                                 key=lambda r: -len(r[0]))
+        self._dest_dirs: Dict[str, str] = {}
+        self._src_dir = (None, "")
+        self.policy = cfg.get("behavior", {}).get("conflict_policy", "suffix").lower()
+        self.index = DestIndex()
+        self.resolver = get_resolver(cfg)
+        self.algo = hash_algorithm(cfg)
+        self.metrics = instrument.current()
+
+    def _dest_base(self, idx: int, root: str) -> str:
+        dest_roots = self.dest_roots
+        return dest_roots[idx] if idx < len(dest_roots) and dest_roots[idx] else root
+
+    def _root_index(self, src_path: str) -> int:
+        """Longest include path containing ``src_path``, for entries the scanner did not tag."""
+        src_abs = os.path.abspath(src_path)
+        for root_abs, i in self._by_length:
+            if src_abs == root_abs or src_abs.startswith(root_abs.rstrip(os.sep) + os.sep):
+                return i
+        return 0
+
+    def _same_dir(self, src_dir: str, dest_dir: str) -> bool:
+        # abspath once per source directory (files arrive grouped) and once per destination folder
+        if self._src_dir[0] != src_dir:
+            self._src_dir = (src_dir, os.path.abspath(src_dir))
+        dest_abs = self._dest_dirs.get(dest_dir)
+        if dest_abs is None:
+            dest_abs = self._dest_dirs[dest_dir] = os.path.abspath(dest_dir)
+        return self._src_dir[1] == dest_abs
+
+    def plan(self, entry: FileEntry):
+        cfg = self.cfg
+        metrics = self.metrics
+        src_path = entry.path
+        t0 = time.perf_counter() if metrics is not None else 0.0
+        dest_folder_name = resolve_for_file(entry.ext, cfg, self.resolver)
+        if metrics is not None:
+            metrics.add_time("plan.rules", time.perf_counter() - t0)
+
+        src_dir, name = os.path.split(src_path)
+        current_folder = os.path.basename(src_dir).lower()
+        if current_folder == dest_folder_name.lower():
+            return PreviewItem(src_path, "SKIP", src_path, entry)
+
+        idx = entry.root if entry.root >= 0 else self._root_index(src_path)
+        if idx < len(self._bases):
+            base_root, dest_base_dir = self._bases[idx]
         else:
-            proposed.add(dest_path)
-            yield src_path, "MOVE", dest_path
+            base_root, dest_base_dir = "", self._dest_base(idx, "")
+
+        dest_dir = os.path.join(dest_base_dir, dest_folder_name)
+        dest_path = os.path.join(dest_dir, name)
+
+        if self._same_dir(src_dir, dest_dir):
+            return PreviewItem(src_path, "SKIP", dest_path, entry)
+
+        t0 = time.perf_counter() if metrics is not None else 0.0
+        dest_exists = self.index.on_disk(dest_path)
+        dest_st = stat_or_none(dest_path) if dest_exists else None
+        if metrics is not None:
+            metrics.add_time("plan.exists", time.perf_counter() - t0)
+            metrics.count("plan.dest_exists", int(dest_exists))
+        dup = False
+        if dest_st is not None:
+            # Existing destination: compare contents (never depends on planned names)
+            cache = self.caches.for_root(base_root) if self.caches is not None else None
+            args = (src_path, dest_path, entry, dest_st, cache, self.stats, self.algo)
+            if self.pool is not None and dest_st.st_size == entry.size:
+                dup = self.pool.submit(_compare, *args)
+            else:
+                dup = _compare(*args)
+        return _Pending(entry, dest_path, dest_exists, dup)
+
+    def decide(self, p: _Pending) -> PreviewItem:
+        # Conflict handling, in scan order
+        index = self.index
+        entry, dest_path = p.entry, p.dest_path
+        if p.dest_exists or index.is_proposed(dest_path):
+            # if same content, skip as duplicate
+            if p.is_duplicate():
+                return PreviewItem(entry.path, "SKIP", dest_path, entry)  # duplicate same content
+            if self.policy == "suffix":
+                final_dest = _suffix_path_chain(dest_path, index)
+                index.propose(final_dest)
+                return PreviewItem(entry.path, "MOVE", final_dest, entry)
+            return PreviewItem(entry.path, "CONFLICT", dest_path, entry)
+        index.propose(dest_path)
+        return PreviewItem(entry.path, "MOVE", dest_path, entry)
+
+    def emit(self, item) -> PreviewItem:
+        return self.decide(item) if isinstance(item, _Pending) else item
+
+    def replan(self, entry: FileEntry) -> PreviewItem:
+        return self.emit(self.plan(entry))
+
+
+def build_preview(cfg: Dict, stats: Optional[DedupStats] = None,
+                  snapshot: Optional[DirSnapshot] = None) -> Generator[PreviewItem, None, None]:
+    """Stream the planned action for every scanned file.
+
+    Content comparisons for destinations that already exist can run on a
+    small thread pool (behavior.hash_workers); results are still emitted in
+    scan order and conflict decisions are made in that order, so the output
+    is identical to the serial run.
+
+    Unchanged directories come from the stored directory snapshot
+    (behavior.scan_snapshot); pass ``open_dir_snapshot(cfg, full_rescan=True)``
+    to list everything again, or any snapshot whose counters you want to read.
+    """
+    include_paths = cfg.get("include_paths", [])
+    exclude_patterns = cfg.get("exclude_globs", [])
+    include_hidden = cfg.get("ui", {}).get("show_hidden_files", False)
+    include_subfolders = cfg.get("behavior", {}).get("sort_subfolders", True)
+    scan_workers = int(cfg.get("behavior", {}).get("scan_workers", 1) or 1)
+    scan_ordered = bool(cfg.get("behavior", {}).get("scan_deterministic", True))
+    hash_workers = int(cfg.get("behavior", {}).get("hash_workers", 2) or 1)
+
+    if snapshot is None:
+        snapshot = open_dir_snapshot(cfg)
+    caches = open_hash_caches(cfg)
+    pool = ThreadPoolExecutor(max_workers=hash_workers, thread_name_prefix="fileflow-hash") if hash_workers > 1 else None
+    planner = Planner(cfg, stats, caches, pool)
+    emit = planner.emit
+    # Bound on planned items held back behind an unfinished comparison
+    window = hash_workers * 16
+    pending: deque = deque()
+
+    try:
+        for entry in scan_entries(include_paths, exclude_patterns, include_hidden, include_subfolders,
+                                  workers=scan_workers, ordered=scan_ordered, snapshot=snapshot):
+            item = planner.plan(entry)
+            if not pending and (not isinstance(item, _Pending) or item.ready()):
+                yield emit(item)
+                continue
+            pending.append(item)
+            while pending and (len(pending) > window or not isinstance(pending[0], _Pending) or pending[0].ready()):
+                yield emit(pending.popleft())
+        while pending:
+            yield emit(pending.popleft())
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if caches is not None:
+            caches.save()
+        if snapshot is not None:
+            snapshot.save()
+        metrics = instrument.current()
+        if metrics is not None:
+            if caches is not None:
+                metrics.count("hash_cache.hits", caches.hits)
+                metrics.count("hash_cache.misses", caches.misses)
+            if stats is not None:
+                metrics.merge("dedup", stats.as_dict())
@@ -1,5 +1,88 @@
-from typing import Dict
-from .config import resolve_destination_for_extension
+import threading
+from typing import Dict, Optional
+from .types_map import infer_category, CATEGORY_DESTINATION_DEFAULT
 
-def resolve_for_file(ext: str, cfg: Dict) -> str:
-    return resolve_destination_for_extension(ext, cfg)
\ No newline at end of file
+
+def _normalize_ext(ext: str) -> str:
+    e = ext.strip().lower()
+    if not e.startswith('.'):
+        e = '.' + e
+    return e
+
+
+class RuleResolver:
+    """Extension -> destination folder table compiled once from a config.
+
+    Precedence matches the original lookup: the ``rules`` map wins, then the
+    first ``custom_rules`` entry listing the extension, then the category default.
+    """
+
+    def __init__(self, cfg: Dict):
+        table: Dict[str, str] = {}
+        # Reverse precedence so higher priority entries overwrite lower ones
+        for r in reversed(cfg.get("custom_rules", []) or []):
+            dest = (r.get("destination") or "").strip()
+            if not dest:
+                continue
+            for x in r.get("extensions") or []:
+                table[_normalize_ext(x)] = dest
+        norm_rules = {_normalize_ext(k): (v or "").strip() for k, v in (cfg.get("rules", {}) or {}).items()}
+        for e, dest in norm_rules.items():
+            if dest:
+                table[e] = dest
+        self._table = table
+        # Raw extension as yielded by the scanner -> destination
+        self._memo: Dict[str, str] = {}
+
+    def resolve(self, ext: str) -> str:
+        try:
+            return self._memo[ext]
+        except KeyError:
+            pass
+        if not ext:
+            dest = CATEGORY_DESTINATION_DEFAULT["Other"]
+        else:
+            e = _normalize_ext(ext)
+            dest = self._table.get(e)
+            if dest is None:
+                cat = infer_category(e)
+                dest = CATEGORY_DESTINATION_DEFAULT.get(cat, CATEGORY_DESTINATION_DEFAULT["Other"])
+        self._memo[ext] = dest
+        return dest
+
+
+def rules_fingerprint(cfg: Dict) -> tuple:
+    """Snapshot of everything a RuleResolver is built from, compared with ``==``.
+
+    Copies the (few) rule values into tuples: far cheaper than serialising
+    and hashing them, and in-place edits of the config still change it.
+    """
+    rules = cfg.get("rules", {}) or {}
+    custom = cfg.get("custom_rules", []) or []
+    return (tuple(rules.items()),
+            tuple((tuple(r.get("extensions") or ()), r.get("destination"))
+                  for r in custom if isinstance(r, dict)))
+
+
+_lock = threading.Lock()
+# (fingerprint, resolver) of the most recent config
+_cached: Optional[tuple] = None
+
+
+def get_resolver(cfg: Dict) -> RuleResolver:
+    """Return the compiled resolver for ``cfg``, rebuilding it if the rules changed."""
+    global _cached
+    fp = rules_fingerprint(cfg)
+    with _lock:
+        if _cached is not None and _cached[0] == fp:
+            return _cached[1]
+    resolver = RuleResolver(cfg)
+    with _lock:
+        _cached = (fp, resolver)
+    return resolver
+
+
+def resolve_for_file(ext: str, cfg: Dict, resolver: Optional[RuleResolver] = None) -> str:
+    if resolver is None:
+        resolver = get_resolver(cfg)
+    return resolver.resolve(ext)
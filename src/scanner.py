@@ -1,55 +1,351 @@
 import os
+import re
 import fnmatch
-from typing import Generator, List, Tuple
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import lru_cache
+from typing import Generator, List, NamedTuple, Optional, Tuple
+from . import instrument
+from .journal import INDEX_SUFFIX, JOURNAL_NAME
+from .utils.hash_cache import CACHE_FILENAME
 
-def _should_exclude(path: str, exclude_patterns: List[str]) -> bool:
-    base = os.path.basename(path)
-    for pat in exclude_patterns:
-        if fnmatch.fnmatch(base, pat):
+# Used by dir_snapshot; defined here because dir_snapshot itself imports the scanner
+SNAPSHOT_FILENAME = ".fileflow_scansnap.json"
+# FileFlow's own bookkeeping files: the journal in the first include root, and the
+# caches that older versions kept in every root. Never treated as user files
+OWN_FILES = frozenset({JOURNAL_NAME, JOURNAL_NAME + INDEX_SUFFIX, CACHE_FILENAME, CACHE_FILENAME + ".tmp",
+                       SNAPSHOT_FILENAME, SNAPSHOT_FILENAME + ".tmp"})
+
+_MAGIC = frozenset("*?[")
+# fnmatch folds case through os.path.normcase; only Windows actually changes names
+_FOLD_CASE = os.path.normcase("A") != "A"
+
+
+class ExcludeMatcher:
+    """Exclusion globs compiled once per scan.
+
+    Literal names go into a set, ``*.ext`` patterns into a suffix set and the
+    rest into one combined regex, so the cost per name barely grows with the
+    number of patterns. Semantics are those of ``fnmatch.fnmatch``.
+    """
+
+    __slots__ = ("patterns", "_literals", "_suffixes", "_regex")
+
+    def __init__(self, patterns: List[str]):
+        self.patterns = tuple(patterns)
+        literals = set()
+        suffixes = set()
+        other = []
+        for pat in self.patterns:
+            if _FOLD_CASE:
+                pat = os.path.normcase(pat)
+            if not _MAGIC.intersection(pat):
+                literals.add(pat)
+            elif pat.startswith("*.") and not _MAGIC.intersection(pat[1:]):
+                suffixes.add(pat[1:])
+            else:
+                other.append(fnmatch.translate(pat))
+        self._literals = frozenset(literals)
+        self._suffixes = frozenset(suffixes)
+        self._regex = re.compile("|".join(other)).match if other else None
+
+    def match(self, name: str) -> bool:
+        if _FOLD_CASE:
+            name = os.path.normcase(name)
+        if name in self._literals:
             return True
-    return False
+        if self._suffixes:
+            i = name.find(".")
+            while i != -1:
+                if name[i:] in self._suffixes:
+                    return True
+                i = name.find(".", i + 1)
+        return self._regex is not None and self._regex(name) is not None
+
+
+class _TimedMatcher:
+    """ExcludeMatcher that records its time and hits; only used while instrumentation is on."""
+
+    __slots__ = ("patterns", "_match", "_metrics")
+
+    def __init__(self, matcher: ExcludeMatcher, metrics):
+        self.patterns = matcher.patterns
+        self._match = matcher.match
+        self._metrics = metrics
+
+    def match(self, name: str) -> bool:
+        t0 = time.perf_counter()
+        hit = self._match(name)
+        self._metrics.add_time("scan.exclude", time.perf_counter() - t0)
+        if hit:
+            self._metrics.count("scan.excluded")
+        return hit
+
+
+@lru_cache(maxsize=32)
+def _compiled(patterns: Tuple[str, ...]) -> ExcludeMatcher:
+    return ExcludeMatcher(list(patterns))
+
+
+def compile_excludes(exclude_patterns: List[str]) -> ExcludeMatcher:
+    return _compiled(tuple(exclude_patterns))
+
+
+def _should_exclude(path: str, exclude_patterns: List[str]) -> bool:
+    return compile_excludes(exclude_patterns).match(os.path.basename(path))
 
 def _dir_should_exclude(dir_name: str, exclude_patterns: List[str]) -> bool:
-    for pat in exclude_patterns:
-        if fnmatch.fnmatch(dir_name, pat):
-            return True
-    return False
+    return compile_excludes(exclude_patterns).match(dir_name)
 
-def scan_paths(paths: list[str],
-               exclude_patterns: list[str],
-               include_hidden: bool = False,
-               include_subfolders: bool = True) -> Generator[tuple[str, str], None, None]:
+class FileEntry(NamedTuple):
+    """A scanned file plus the stat fields the rest of the pipeline needs."""
+    path: str
+    ext: str
+    size: int
+    mtime_ns: int
+    dev: int
+    ino: int
+    # Index into the include paths of the root the file was found under (-1: unknown)
+    root: int = -1
 
-    for root_path in paths:
-        if not os.path.exists(root_path):
-            continue
 
-        if include_subfolders:
-            for dirpath, dirnames, filenames in os.walk(root_path):
-                if not include_hidden:
-                    dirnames[:] = [d for d in dirnames if not d.startswith(".")]
-                dirnames[:] = [d for d in dirnames if not _dir_should_exclude(d, exclude_patterns)]
-                for fname in filenames:
-                    # Skip hidden files if requested
-                    if not include_hidden and fname.startswith("."):
-                        continue
-                    full_path = os.path.join(dirpath, fname)
-                    # Skip excluded files
-                    if _should_exclude(full_path, exclude_patterns):
-                        continue
-                    _, ext = os.path.splitext(fname)
-                    yield full_path, ext
-        else:
+def refresh_entry(entry: FileEntry) -> Optional[FileEntry]:
+    """``entry`` if the file is unchanged, a fresh entry if it changed, None if it is gone."""
+    try:
+        st = os.stat(entry.path)
+    except OSError:
+        try:
+            st = os.lstat(entry.path)
+        except OSError:
+            return None
+    if (st.st_size == entry.size and st.st_mtime_ns == entry.mtime_ns
+            and st.st_ino == entry.ino and st.st_dev == entry.dev):
+        return entry
+    return FileEntry(entry.path, entry.ext, st.st_size, st.st_mtime_ns, st.st_dev, st.st_ino, entry.root)
+
+
+def _entry_stat(entry: os.DirEntry):
+    try:
+        return entry.stat()
+    except OSError:
+        # Dangling symlink: describe the link itself
+        return entry.stat(follow_symlinks=False)
+
+
+def _list_dir(dirpath: str,
+              matcher: ExcludeMatcher,
+              include_hidden: bool,
+              recursive: bool,
+              root: int = -1) -> Tuple[List[FileEntry], List[str]]:
+    """List one directory with a single scandir pass.
+
+    Returns the files to yield and, when ``recursive``, the subdirectories to
+    descend into. Mirrors ``os.walk`` (non-dirs are files, symlinked dirs are
+    not followed) and the ``os.path.isfile`` filter of the flat mode.
+    """
+    files: List[FileEntry] = []
+    subdirs: List[str] = []
+    try:
+        it = os.scandir(dirpath)
+    except OSError:
+        return files, subdirs
+    with it:
+        for entry in it:
+            name = entry.name
+            if not include_hidden and name.startswith("."):
+                continue
             try:
-                for fname in os.listdir(root_path):
-                    full_path = os.path.join(root_path, fname)
-                    if not os.path.isfile(full_path):
-                        continue
-                    if not include_hidden and fname.startswith("."):
-                        continue
-                    if _should_exclude(full_path, exclude_patterns):
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if is_dir:
+                if recursive and not matcher.match(name):
+                    try:
+                        if not entry.is_symlink():
+                            subdirs.append(entry.path)
+                    except OSError:
+                        pass
+                continue
+            if not recursive:
+                try:
+                    if not entry.is_file():
                         continue
-                    _, ext = os.path.splitext(fname)
-                    yield full_path, ext
+                except OSError:
+                    continue
+            if name in OWN_FILES or matcher.match(name):
+                continue
+            try:
+                st = _entry_stat(entry)
             except OSError:
                 continue
+            _, ext = os.path.splitext(name)
+            files.append(FileEntry(entry.path, ext, st.st_size, st.st_mtime_ns, st.st_dev, st.st_ino, root))
+    return files, subdirs
+
+
+class _DirLister:
+    """Lists directories for one walk: exclusions, the optional snapshot, nested include roots."""
+
+    __slots__ = ("matcher", "include_hidden", "recursive", "snapshot", "nested", "metrics")
+
+    def __init__(self, matcher: ExcludeMatcher, include_hidden: bool, recursive: bool,
+                 snapshot=None, nested: frozenset = frozenset()):
+        self.matcher = matcher
+        self.include_hidden = include_hidden
+        self.recursive = recursive
+        self.snapshot = snapshot
+        # Absolute paths of include roots inside another root; their own walk covers them
+        self.nested = nested
+        self.metrics = instrument.current()
+
+    def __call__(self, dirpath: str, root: int) -> Tuple[List[FileEntry], List[str]]:
+        """``_list_dir``, served from the snapshot while the directory's mtime is unchanged."""
+        snapshot, metrics = self.snapshot, self.metrics
+        if snapshot is None and metrics is None:
+            files, subdirs = _list_dir(dirpath, self.matcher, self.include_hidden, self.recursive, root)
+        else:
+            files, subdirs = self._list_tracked(dirpath, root)
+        if self.nested and subdirs:
+            subdirs = [d for d in subdirs if os.path.abspath(d) not in self.nested]
+        return files, subdirs
+
+    def _list_tracked(self, dirpath: str, root: int) -> Tuple[List[FileEntry], List[str]]:
+        snapshot, metrics = self.snapshot, self.metrics
+        t0 = time.perf_counter()
+        listed = True
+        if snapshot is None:
+            files, subdirs = _list_dir(dirpath, self.matcher, self.include_hidden, self.recursive, root)
+        else:
+            try:
+                mtime_ns = os.stat(dirpath).st_mtime_ns
+            except OSError:
+                return [], []
+            cached = snapshot.lookup(dirpath, mtime_ns, root)
+            if cached is not None:
+                files, subdirs = cached
+                listed = False
+            else:
+                files, subdirs = _list_dir(dirpath, self.matcher, self.include_hidden, self.recursive, root)
+                snapshot.record(dirpath, mtime_ns, files, subdirs)
+        if metrics is not None:
+            metrics.add_time("scan.list" if listed else "scan.snapshot", time.perf_counter() - t0)
+            metrics.count("scan.dirs_listed" if listed else "scan.dirs_skipped")
+            metrics.count("scan.files", len(files))
+            # One stat per file (served ones are refreshed), plus the directory's own for the snapshot check
+            metrics.count("scan.stats", len(files) + (snapshot is not None))
+        return files, subdirs
+
+
+def scan_roots(paths: List[str]) -> List[Tuple[str, int]]:
+    """Existing include paths with their index, each directory once (first occurrence wins)."""
+    roots: List[Tuple[str, int]] = []
+    seen = set()
+    for i, p in enumerate(paths):
+        norm = os.path.abspath(p)
+        if norm in seen or not os.path.exists(p):
+            continue
+        seen.add(norm)
+        roots.append((p, i))
+    return roots
+
+
+def _nested_roots(roots: List[Tuple[str, int]]) -> frozenset:
+    norms = [os.path.abspath(p) for p, _ in roots]
+    return frozenset(n for n in norms
+                     if any(n.startswith(other.rstrip(os.sep) + os.sep) for other in norms if other != n))
+
+
+def _scan_serial(roots: List[Tuple[str, int]], lister: _DirLister) -> Generator[FileEntry, None, None]:
+    stack = list(reversed(roots))
+    while stack:
+        path, root = stack.pop()
+        files, subdirs = lister(path, root)
+        yield from files
+        stack.extend((d, root) for d in reversed(subdirs))
+
+
+def _scan_parallel(roots: List[Tuple[str, int]],
+                   lister: _DirLister,
+                   workers: int,
+                   ordered: bool) -> Generator[FileEntry, None, None]:
+    """Fan directory listings out over a thread pool.
+
+    With ``ordered`` the listings of the next few directories in depth-first
+    order are prefetched and consumed in that order, so the output is exactly
+    the serial order. Otherwise directories are emitted as their listing
+    completes. At most ``workers * 4`` listings are in flight at once.
+    """
+    window = workers * 4
+    pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fileflow-scan")
+
+    try:
+        if ordered:
+            # Each node is [path, root, future]; the top of the stack is emitted next
+            stack = [[p, r, None] for p, r in reversed(roots)]
+            while stack:
+                for node in stack[-1:-window - 1:-1]:
+                    if node[2] is None:
+                        node[2] = pool.submit(lister, node[0], node[1])
+                _path, root, fut = stack.pop()
+                files, subdirs = fut.result()
+                yield from files
+                stack.extend([d, root, None] for d in reversed(subdirs))
+        else:
+            pending = deque(roots)
+            inflight = {}
+            while pending or inflight:
+                while pending and len(inflight) < window:
+                    path, root = pending.pop()
+                    inflight[pool.submit(lister, path, root)] = root
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    root = inflight.pop(fut)
+                    files, subdirs = fut.result()
+                    yield from files
+                    pending.extend((d, root) for d in subdirs)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def scan_entries(paths: list[str],
+                 exclude_patterns: list[str],
+                 include_hidden: bool = False,
+                 include_subfolders: bool = True,
+                 workers: int = 1,
+                 ordered: bool = True,
+                 snapshot=None) -> Generator[FileEntry, None, None]:
+    """Walk the include paths yielding one FileEntry (one stat) per file.
+
+    Each entry carries the index of its include path in ``root``. An include
+    path nested inside another is walked on its own and skipped by the outer
+    walk, so every file is yielded once, tagged with the longest matching
+    root. ``workers > 1`` lists directories on a thread pool, which mostly
+    helps on high-latency (network) mounts. With ``ordered`` the output
+    matches the serial ``os.walk`` order exactly. A ``snapshot`` (see
+    dir_snapshot) serves directories whose mtime did not move and records the
+    ones listed; it is marked complete once the walk finishes.
+    """
+    matcher = compile_excludes(exclude_patterns)
+    metrics = instrument.current()
+    if metrics is not None:
+        matcher = _TimedMatcher(matcher, metrics)
+    roots = scan_roots(paths)
+    nested = _nested_roots(roots) if include_subfolders and len(roots) > 1 else frozenset()
+    lister = _DirLister(matcher, include_hidden, include_subfolders, snapshot, nested)
+    if workers > 1:
+        yield from _scan_parallel(roots, lister, workers, ordered)
+    else:
+        yield from _scan_serial(roots, lister)
+    if snapshot is not None:
+        snapshot.complete = True
+
+
+def scan_paths(paths: list[str],
+               exclude_patterns: list[str],
+               include_hidden: bool = False,
+               include_subfolders: bool = True,
+               workers: int = 1,
+               ordered: bool = True) -> Generator[tuple[str, str], None, None]:
+    for entry in scan_entries(paths, exclude_patterns, include_hidden, include_subfolders, workers, ordered):
+        yield entry.path, entry.ext
@@ -0,0 +1,135 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional, Tuple
+
+
+class LogBuffer:
+    """Bounded ring of log lines, written to a Text widget in bulk.
+
+    ``append`` is thread-safe and never touches Tk; ``flush`` must run on the
+    Tk thread and inserts everything pending with one call, then trims the
+    widget back to ``max_lines`` with one delete.
+    """
+
+    def __init__(self, max_lines: int = 1000):
+        self.max_lines = max_lines
+        # Lines beyond max_lines would be trimmed from the widget anyway
+        self._pending: deque = deque(maxlen=max_lines)
+        self._lock = threading.Lock()
+
+    def append(self, line: str) -> None:
+        with self._lock:
+            self._pending.append(line)
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def flush(self, text) -> int:
+        with self._lock:
+            if not self._pending:
+                return 0
+            lines = list(self._pending)
+            self._pending.clear()
+        text.insert("end", "\n".join(lines) + "\n")
+        current = int(text.index("end-1c").split(".")[0])
+        if current > self.max_lines:
+            text.delete("1.0", f"{current - self.max_lines}.0")
+        text.see("end")
+        return len(lines)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending.clear()
+
+
+class StatusThrottle:
+    """Keeps only the latest status message and shows it at most every ``min_interval`` seconds."""
+
+    def __init__(self, show: Callable[[str], None], min_interval: float = 0.25):
+        self._show = show
+        self.min_interval = min_interval
+        self._latest: Optional[str] = None
+        self._last_shown = 0.0
+
+    def set(self, msg: str, force: bool = False) -> None:
+        self._latest = msg
+        self.flush(force)
+
+    def flush(self, force: bool = False) -> None:
+        if self._latest is None:
+            return
+        now = time.monotonic()
+        if force or now - self._last_shown >= self.min_interval:
+            self._show(self._latest)
+            self._latest = None
+            self._last_shown = now
+
+
+class UIPump:
+    """Calls ``drain(limit)`` from the Tk event loop within a per-tick time budget.
+
+    ``drain`` handles at most ``limit`` items and returns ``(handled, done)``.
+    The limit adapts to the measured cost: it doubles while a full batch
+    takes under half the budget and shrinks proportionally when a batch
+    overruns it. While items keep coming the next tick is scheduled right
+    away (after Tk had a chance to redraw); when the source is idle it waits
+    ``idle_ms``. ``on_tick`` runs after every drain, e.g. to refresh views.
+    """
+
+    def __init__(self, widget, drain: Callable[[int], Tuple[int, bool]],
+                 budget_ms: float = 8.0, idle_ms: int = 50,
+                 on_tick: Optional[Callable[[], None]] = None,
+                 min_batch: int = 32, max_batch: int = 1 << 20):
+        self.widget = widget
+        self.drain = drain
+        self.budget = budget_ms / 1000.0
+        self.idle_ms = idle_ms
+        self.on_tick = on_tick
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.batch = min_batch
+        self.ticks = 0
+        self.last_frame_ms = 0.0
+        self._after_id = None
+        self._running = False
+
+    def start(self) -> None:
+        self._running = True
+        self._schedule(0)
+
+    def stop(self) -> None:
+        self._running = False
+        if self._after_id is not None:
+            try:
+                self.widget.after_cancel(self._after_id)
+            except Exception:
+                pass
+            self._after_id = None
+
+    def _schedule(self, delay_ms: int) -> None:
+        if self._running:
+            self._after_id = self.widget.after(delay_ms, self._tick)
+
+    def _tick(self) -> None:
+        self._after_id = None
+        if not self._running:
+            return
+        t0 = time.perf_counter()
+        limit = self.batch
+        handled, done = self.drain(limit)
+        if self.on_tick is not None:
+            self.on_tick()
+        elapsed = time.perf_counter() - t0
+        self.ticks += 1
+        self.last_frame_ms = elapsed * 1000.0
+        if elapsed > self.budget:
+            self.batch = max(self.min_batch, int(self.batch * self.budget / elapsed))
+        elif handled >= limit and elapsed < self.budget / 2:
+            self.batch = min(self.max_batch, self.batch * 2)
+        if done:
+            self._running = False
+            return
+        # A full batch means more is probably waiting
+        self._schedule(1 if handled >= limit else self.idle_ms)
@@ -0,0 +1,102 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Optional
+from .. import instrument
+from .hash_cache import HashCache, is_racy, meta_key
+from .hash_utils import DEFAULT_ALGO, file_hash
+
+# Bytes read from each of the head, middle and tail of a file for the sample tier
+SAMPLE_BLOCK = 64 * 1024
+
+
+def _meta_size(meta) -> int:
+    return meta.st_size if hasattr(meta, "st_size") else meta.size
+
+
+class DedupStats:
+    """Counters for the tiered comparator; bytes avoided are relative to full-hashing both files."""
+
+    def __init__(self):
+        self.compared = 0
+        self.duplicates = 0
+        self.size_rejects = 0
+        self.sample_rejects = 0
+        self.full_hashes = 0
+        self.bytes_avoided_size = 0
+        self.bytes_avoided_sample = 0
+        self._lock = threading.Lock()
+
+    def add(self, **counts: int) -> None:
+        with self._lock:
+            for name, n in counts.items():
+                setattr(self, name, getattr(self, name) + n)
+
+    def as_dict(self) -> dict:
+        return {k: v for k, v in vars(self).items() if not k.startswith("_")}
+
+    def summary(self) -> str:
+        mib = 1024 * 1024
+        return (f"compared {self.compared}, duplicates {self.duplicates} | "
+                f"size tier rejected {self.size_rejects} ({self.bytes_avoided_size / mib:.1f} MiB not read), "
+                f"sample tier rejected {self.sample_rejects} ({self.bytes_avoided_sample / mib:.1f} MiB not read), "
+                f"full hashes {self.full_hashes}")
+
+
+def sample_hash(path: str, meta, algo: str = DEFAULT_ALGO, cache: Optional[HashCache] = None) -> str:
+    """Digest of the size plus the head, middle and tail blocks of the file."""
+    key = meta_key(meta, "sample-" + algo)
+    if cache is not None:
+        digest = cache.get(key)
+        if digest is not None:
+            return digest
+    size = _meta_size(meta)
+    metrics = instrument.current()
+    t0 = time.perf_counter() if metrics is not None else 0.0
+    h = hashlib.new(algo)
+    h.update(str(size).encode())
+    with open(path, "rb") as f:
+        for offset in (0, (size - SAMPLE_BLOCK) // 2, size - SAMPLE_BLOCK):
+            f.seek(offset)
+            h.update(f.read(SAMPLE_BLOCK))
+        after = os.fstat(f.fileno()) if cache is not None else None
+    digest = h.hexdigest()
+    if metrics is not None:
+        metrics.add_time("hash.sample", time.perf_counter() - t0)
+        metrics.count("hash.bytes", 3 * SAMPLE_BLOCK)
+    # As in file_hash: only remember samples of the file version the key names
+    if after is not None and meta_key(after, "sample-" + algo) == key and not is_racy(after):
+        cache.put(key, digest)
+    return digest
+
+
+def files_identical(src: str, dest: str, src_meta=None, dest_meta=None,
+                    cache: Optional[HashCache] = None, stats: Optional[DedupStats] = None,
+                    algo: str = DEFAULT_ALGO) -> bool:
+    """Tiered content comparison: size, then head/middle/tail sample, then full hash.
+
+    ``src_meta``/``dest_meta`` are FileEntry or os.stat_result values; they are
+    stat'ed when omitted. Errors (e.g. unreadable files) propagate.
+    """
+    if src_meta is None:
+        src_meta = os.stat(src)
+    if dest_meta is None:
+        dest_meta = os.stat(dest)
+    size = _meta_size(src_meta)
+    if stats is not None:
+        stats.add(compared=1)
+    if size != _meta_size(dest_meta):
+        if stats is not None:
+            stats.add(size_rejects=1, bytes_avoided_size=size + _meta_size(dest_meta))
+        return False
+    # Small files: the samples would cover the whole file anyway
+    if size > 3 * SAMPLE_BLOCK:
+        if sample_hash(src, src_meta, algo, cache) != sample_hash(dest, dest_meta, algo, cache):
+            if stats is not None:
+                stats.add(sample_rejects=1, bytes_avoided_sample=2 * (size - 3 * SAMPLE_BLOCK))
+            return False
+    same = file_hash(src, algo, cache=cache, meta=src_meta) == file_hash(dest, algo, cache=cache, meta=dest_meta)
+    if stats is not None:
+        stats.add(full_hashes=1, duplicates=int(same))
+    return same
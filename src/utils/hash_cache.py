@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from .os_ops import RACY_NS
+
+CACHE_FILENAME = ".fileflow_hashcache.json"
+_VERSION = 1
+
+
+def state_dir(cfg: Dict) -> str:
+    """Directory for FileFlow's per-root caches (hash cache, scan snapshot).
+
+    Defaults to ``cache`` next to the default config file; ``behavior.cache_dir``
+    overrides it. Never an include root: writing there would change the root's
+    mtime, and the scan snapshot would then list the root again on every run.
+    """
+    custom = cfg.get("behavior", {}).get("cache_dir")
+    if custom:
+        return custom
+    # config imports hash_utils, which imports this module
+    from ..config import get_default_config_path
+    return os.path.join(os.path.dirname(get_default_config_path()), "cache")
+
+
+def root_state_path(state: str, root: str, filename: str) -> str:
+    """``filename`` for include root ``root`` inside the state directory."""
+    key = hashlib.sha1(os.path.normcase(os.path.abspath(root)).encode("utf-8", "surrogateescape")).hexdigest()
+    return os.path.join(state, f"{key[:16]}-{filename.lstrip('.')}")
+
+
+def meta_key(meta, algo: str) -> str:
+    """Cache key for a FileEntry or os.stat_result: (st_dev, st_ino, size, mtime_ns, algorithm)."""
+    if hasattr(meta, "st_size"):
+        return f"{meta.st_dev}:{meta.st_ino}:{meta.st_size}:{meta.st_mtime_ns}:{algo}"
+    return f"{meta.dev}:{meta.ino}:{meta.size}:{meta.mtime_ns}:{algo}"
+
+
+def is_racy(meta) -> bool:
+    mtime_ns = meta.st_mtime_ns if hasattr(meta, "st_mtime_ns") else meta.mtime_ns
+    return time.time_ns() - mtime_ns < RACY_NS
+
+
+class HashCache:
+    """LRU map of file identity -> digest, persisted as JSON next to an include root."""
+
+    def __init__(self, path: str, max_entries: int = 200_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str, max_entries: int = 200_000) -> "HashCache":
+        cache = cls(path, max_entries)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                blob = json.load(f)
+            if blob.get("version") == _VERSION and isinstance(blob.get("entries"), list):
+                # Stored oldest first, so insertion order is the LRU order
+                for k, v in blob["entries"][-max_entries:]:
+                    cache._data[k] = v
+        except (OSError, ValueError, TypeError, AttributeError):
+            # Missing or corrupt cache: start empty
+            cache._data.clear()
+        return cache
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            digest = self._data.get(key)
+            if digest is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return digest
+
+    def put(self, key: str, digest: str) -> None:
+        with self._lock:
+            self._data[key] = digest
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+            self._dirty = True
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def save(self) -> None:
+        with self._lock:
+            if not self._dirty:
+                return
+            blob = {"version": _VERSION, "entries": list(self._data.items())}
+            self._dirty = False
+        tmp = self.path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(blob, f, separators=(",", ":"))
+            os.replace(tmp, self.path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+
+class HashCacheSet:
+    """One HashCache per include root, picked by longest matching root."""
+
+    def __init__(self, include_paths: List[str], state: str, max_entries: int = 200_000):
+        self._caches: Dict[str, HashCache] = {}
+        self._roots: List[str] = []
+        for root in include_paths:
+            if not os.path.isdir(root):
+                continue
+            norm = os.path.abspath(root)
+            if norm not in self._caches:
+                self._caches[norm] = HashCache.load(root_state_path(state, norm, CACHE_FILENAME), max_entries)
+                self._roots.append(norm)
+        self._roots.sort(key=len, reverse=True)
+
+    def for_path(self, path: str) -> Optional[HashCache]:
+        p = os.path.abspath(path)
+        for root in self._roots:
+            if p == root or p.startswith(root.rstrip(os.sep) + os.sep):
+                return self._caches[root]
+        return self._caches[self._roots[-1]] if self._roots else None
+
+    def for_root(self, root: str) -> Optional[HashCache]:
+        return self._caches.get(os.path.abspath(root))
+
+    @property
+    def hits(self) -> int:
+        return sum(c.hits for c in self._caches.values())
+
+    @property
+    def misses(self) -> int:
+        return sum(c.misses for c in self._caches.values())
+
+    def save(self) -> None:
+        for cache in self._caches.values():
+            cache.save()
+
+
+def open_hash_caches(cfg: Dict) -> Optional[HashCacheSet]:
+    beh = cfg.get("behavior", {})
+    if not beh.get("hash_cache", True):
+        return None
+    return HashCacheSet(cfg.get("include_paths", []), state_dir(cfg), int(beh.get("hash_cache_max_entries", 200_000)))
@@ -1,11 +1,91 @@
 import hashlib
+import mmap
+import os
+import threading
+import time
+from typing import Dict, Optional
+from .. import instrument
+from .hash_cache import HashCache, is_racy, meta_key
 
-def file_hash(path: str, algo: str = "sha1", bufsize: int = 1024 * 1024) -> str:
+# Dedup only needs collision resistance against accidents, not attackers;
+# blake2b is the fastest general-purpose digest in hashlib on 64-bit CPUs.
+DEFAULT_ALGO = "blake2b"
+# Files at least this large are hashed straight from a memory map
+MMAP_THRESHOLD = 64 * 1024 * 1024
+
+_local = threading.local()
+
+def available_algorithms() -> list[str]:
+    # shake_* need an explicit digest length, so they are not usable here
+    return sorted(a for a in hashlib.algorithms_available if not a.startswith("shake_"))
+
+def resolve_algorithm(name: Optional[str]) -> str:
+    name = (name or "").strip().lower()
+    return name if name in available_algorithms() else DEFAULT_ALGO
+
+def hash_algorithm(cfg: Dict) -> str:
+    return resolve_algorithm(cfg.get("behavior", {}).get("hash_algorithm"))
+
+def _buffer(bufsize: int) -> memoryview:
+    # One reusable read buffer per thread
+    buf = getattr(_local, "buf", None)
+    if buf is None or len(buf) != bufsize:
+        buf = memoryview(bytearray(bufsize))
+        _local.buf = buf
+    return buf
+
+def _hash_contents(path: str, algo: str, bufsize: int) -> str:
+    metrics = instrument.current()
+    if metrics is None:
+        return _digest_file(path, algo, bufsize)[0]
+    t0 = time.perf_counter()
+    digest, size = _digest_file(path, algo, bufsize)
+    metrics.add_time("hash.full", time.perf_counter() - t0)
+    metrics.count("hash.bytes", size)
+    return digest
+
+def _digest_file(path: str, algo: str, bufsize: int):
     h = hashlib.new(algo)
     with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_THRESHOLD:
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    h.update(mm)
+                return h.hexdigest(), size
+            except (OSError, ValueError):
+                # Not mappable (e.g. special file); fall back to reads
+                h = hashlib.new(algo)
+                f.seek(0)
+        buf = _buffer(bufsize)
         while True:
-            chunk = f.read(bufsize)
-            if not chunk:
+            n = f.readinto(buf)
+            if not n:
                 break
-            h.update(chunk)
-    return h.hexdigest()
+            h.update(buf[:n])
+    return h.hexdigest(), size
+
+def file_hash(path: str, algo: str = DEFAULT_ALGO, bufsize: int = 1024 * 1024,
+              cache: Optional[HashCache] = None, meta=None) -> str:
+    """Digest of the file's contents.
+
+    With a ``cache``, ``meta`` (a FileEntry or os.stat_result, stat'ed if not
+    given) identifies the file version; a hit avoids reading the file at all.
+    """
+    if cache is None:
+        return _hash_contents(path, algo, bufsize)
+    if meta is None:
+        meta = os.stat(path)
+    key = meta_key(meta, algo)
+    digest = cache.get(key)
+    if digest is not None:
+        return digest
+    digest = _hash_contents(path, algo, bufsize)
+    # Only remember digests of files that did not change while being read
+    try:
+        after = os.stat(path)
+    except OSError:
+        return digest
+    if meta_key(after, algo) == key and not is_racy(after):
+        cache.put(key, digest)
+    return digest
@@ -1,6 +1,17 @@
 import os
 import sys
 import subprocess
+from typing import Optional
+
+# A file or directory modified this recently may change again within the same
+# mtime tick, so its mtime does not prove it is unchanged
+RACY_NS = 2_000_000_000
+
+def stat_or_none(path: str) -> Optional[os.stat_result]:
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
 
 def open_file(path: str) -> None:
     if not os.path.exists(path):
@@ -0,0 +1,241 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import shutil
+import stat
+import sys
+import threading
+import time
+from typing import Dict, Optional
+
+# Chunk size for kernel copies and the userspace fallback
+COPY_CHUNK = 8 * 1024 * 1024
+
+# Errors meaning "this copy primitive is not usable here", not "the copy failed"
+_UNSUPPORTED = {getattr(errno, name) for name in ("EXDEV", "ENOSYS", "EINVAL", "EOPNOTSUPP", "ENOTSUP", "EBADF")
+                if hasattr(errno, name)}
+
+
+# renameat2(RENAME_NOREPLACE): an atomic rename that fails instead of replacing
+_AT_FDCWD = -100
+_RENAME_NOREPLACE = 1
+
+
+def _load_renameat2():
+    # glibc 2.28+; on other platforms and older libcs the hard-link path is used
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fn = libc.renameat2
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint)
+    fn.restype = ctypes.c_int
+    return fn
+
+
+_renameat2 = _load_renameat2()
+
+
+class DeviceMap:
+    """st_dev of destination directories, stat'ed once per directory.
+
+    A directory that does not exist yet takes the device of its nearest
+    existing ancestor, which is where it will be created.
+    """
+
+    def __init__(self):
+        self._devs: Dict[str, Optional[int]] = {}
+        self._lock = threading.Lock()
+
+    def dev_of_dir(self, path: str) -> Optional[int]:
+        path = os.path.abspath(path)
+        dev = self._devs.get(path, -1)
+        if dev != -1:
+            return dev
+        try:
+            dev = os.stat(path).st_dev
+        except OSError:
+            parent = os.path.dirname(path)
+            dev = self.dev_of_dir(parent) if parent != path else None
+        with self._lock:
+            self._devs[path] = dev
+        return dev
+
+
+
+class TransferStats:
+    """Per-path move counters for one batch."""
+
+    def __init__(self):
+        self._kinds: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, nbytes: int, seconds: float) -> None:
+        with self._lock:
+            rec = self._kinds.setdefault(kind, [0, 0, 0.0])
+            rec[0] += 1
+            rec[1] += nbytes
+            rec[2] += seconds
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {k: {"moves": n, "bytes": b, "seconds": round(s, 6),
+                        "bytes_per_s": (b / s) if s > 0 else 0.0}
+                    for k, (n, b, s) in self._kinds.items()}
+
+    def summary(self) -> str:
+        parts = []
+        for kind, rec in sorted(self.as_dict().items()):
+            mib = rec["bytes"] / (1024 * 1024)
+            rate = rec["bytes_per_s"] / (1024 * 1024)
+            parts.append(f"{kind}: {rec['moves']} files, {mib:.1f} MiB, {rate:.1f} MiB/s")
+        return " | ".join(parts) if parts else "no moves"
+
+
+def _copy_copy_file_range(fi, fo, size: int) -> bool:
+    if not hasattr(os, "copy_file_range"):
+        return False
+    done = 0
+    while done < size:
+        try:
+            n = os.copy_file_range(fi.fileno(), fo.fileno(), min(COPY_CHUNK, size - done))
+        except OSError as e:
+            if done == 0 and e.errno in _UNSUPPORTED:
+                return False
+            raise
+        if n == 0:
+            break
+        done += n
+    return True
+
+
+def _copy_sendfile(fi, fo, size: int) -> bool:
+    # Only Linux accepts a regular file as sendfile's destination
+    if not hasattr(os, "sendfile") or not sys.platform.startswith("linux"):
+        return False
+    done = 0
+    while done < size:
+        try:
+            n = os.sendfile(fo.fileno(), fi.fileno(), done, min(COPY_CHUNK, size - done))
+        except OSError as e:
+            if done == 0 and e.errno in _UNSUPPORTED:
+                return False
+            raise
+        if n == 0:
+            break
+        done += n
+    return True
+
+
+def _copy_buffered(fi, fo) -> None:
+    buf = memoryview(bytearray(COPY_CHUNK))
+    while True:
+        n = fi.readinto(buf)
+        if not n:
+            break
+        fo.write(buf[:n])
+
+
+def _copy_then_unlink(src: str, dest: str, size: int) -> str:
+    """Copy across filesystems with the fastest available primitive, then remove ``src``."""
+    # "x" refuses to clobber anything that appeared at dest meanwhile
+    with open(src, "rb") as fi, open(dest, "xb") as fo:
+        try:
+            if _copy_copy_file_range(fi, fo, size):
+                kind = "copy_file_range"
+            elif _copy_sendfile(fi, fo, size):
+                kind = "sendfile"
+            else:
+                _copy_buffered(fi, fo)
+                kind = "buffered_copy"
+            # Pick up anything appended since the size was taken
+            fo.seek(0, os.SEEK_END)
+            if fo.tell() < os.fstat(fi.fileno()).st_size:
+                fi.seek(fo.tell())
+                _copy_buffered(fi, fo)
+        except BaseException:
+            fo.close()
+            try:
+                os.remove(dest)
+            except OSError:
+                pass
+            raise
+    shutil.copystat(src, dest)
+    os.unlink(src)
+    return kind
+
+
+def _exists_error(dest: str) -> FileExistsError:
+    return FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), dest)
+
+
+def _rename_noreplace(src: str, dest: str, st: os.stat_result) -> None:
+    """Rename ``src`` to ``dest``; FileExistsError instead of replacing an existing ``dest``."""
+    if sys.platform.startswith("win"):
+        # Windows renames never replace
+        os.rename(src, dest)
+        return
+    global _renameat2
+    if _renameat2 is not None:
+        if _renameat2(_AT_FDCWD, os.fsencode(src), _AT_FDCWD, os.fsencode(dest), _RENAME_NOREPLACE) == 0:
+            return
+        err = ctypes.get_errno()
+        if err == errno.ENOSYS:
+            # Kernel without renameat2; do not ask again
+            _renameat2 = None
+        elif err != errno.EINVAL:
+            # EINVAL: this filesystem does not support the flag
+            raise OSError(err, os.strerror(err), src, None, dest)
+    if stat.S_ISREG(st.st_mode):
+        # A hard link is created only if dest does not exist; then drop the old name
+        try:
+            os.link(src, dest)
+        except OSError as e:
+            if e.errno in (errno.EEXIST, errno.EXDEV):
+                raise
+        else:
+            os.unlink(src)
+            return
+    # No hard links here (FAT, some network shares) or not a regular file:
+    # only a small window remains between the check and the rename
+    if os.path.lexists(dest):
+        raise _exists_error(dest)
+    os.rename(src, dest)
+
+
+def move_file(src: str, dest: str, same_device: Optional[bool] = None,
+              size: Optional[int] = None, stats: Optional[TransferStats] = None) -> str:
+    """Move one file and return how it was moved.
+
+    Same-device moves are a single atomic rename. Cross-device regular
+    files are copied in the kernel (``copy_file_range``/``sendfile``) with
+    large chunks and then unlinked. Symlinks and special files go through
+    ``shutil.move``. An existing ``dest`` is never replaced: the move raises
+    FileExistsError instead.
+    """
+    t0 = time.perf_counter()
+    st = os.lstat(src)
+    if size is None:
+        size = st.st_size
+    kind = None
+    if same_device is not False:
+        try:
+            _rename_noreplace(src, dest, st)
+            kind = "rename"
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+    if kind is None:
+        if stat.S_ISREG(st.st_mode):
+            kind = _copy_then_unlink(src, dest, st.st_size)
+        else:
+            if os.path.lexists(dest):
+                raise _exists_error(dest)
+            shutil.move(src, dest)
+            kind = "shutil_move"
+    if stats is not None:
+        stats.add(kind, size, time.perf_counter() - t0)
+    return kind
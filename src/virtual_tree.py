@@ -0,0 +1,200 @@
+import tkinter as tk
+from tkinter import ttk
+from typing import Callable, List, Optional, Sequence, Set, Tuple
+
+
+class VirtualTree:
+    """Shows a window of a large row store through a fixed set of Treeview items.
+
+    Only as many items as fit on screen exist; scrolling rewrites their values
+    in place from ``rows`` (any object with ``len`` and integer indexing, e.g.
+    a PlanStore). A filter is a list of row numbers to show instead of all
+    rows. Selection is tracked by row number so it survives scrolling.
+    """
+
+    def __init__(self, tree: ttk.Treeview, scrollbar: ttk.Scrollbar,
+                 format_row: Callable[[object], Tuple[tuple, tuple]]):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self._format_row = format_row
+        self._rows: Sequence = ()
+        self._shown: Optional[Sequence[int]] = None
+        self._top = 0
+        self._iids: List[str] = []
+        self._attached = 0
+        self._selected: Set[int] = set()
+        try:
+            self._row_height = int(ttk.Style().lookup("Treeview", "rowheight") or 20)
+        except (ValueError, tk.TclError):
+            self._row_height = 20
+
+        scrollbar.configure(command=self._on_scrollbar)
+        tree.configure(yscrollcommand=lambda *a: None)
+        tree.bind("<Configure>", lambda e: self._resize(), add="+")
+        tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        tree.bind("<Button-1>", self._on_click, add="+")
+        tree.bind("<Button-3>", self._on_right_click, add="+")
+        tree.bind("<MouseWheel>", self._on_wheel)
+        tree.bind("<Button-4>", lambda e: self.scroll(-3))
+        tree.bind("<Button-5>", lambda e: self.scroll(3))
+        tree.bind("<Up>", lambda e: self._step(-1))
+        tree.bind("<Down>", lambda e: self._step(1))
+        tree.bind("<Prior>", lambda e: self.scroll(-self._page()))
+        tree.bind("<Next>", lambda e: self.scroll(self._page()))
+        tree.bind("<Home>", lambda e: self.scroll_to(0))
+        tree.bind("<End>", lambda e: self.scroll_to(self.total()))
+
+    # Source and filter
+
+    def set_rows(self, rows: Sequence, shown: Optional[Sequence[int]] = None) -> None:
+        self._rows = rows
+        self._shown = shown
+        self._top = 0
+        self._selected.clear()
+        self._render()
+
+    def set_filter(self, shown: Optional[Sequence[int]]) -> None:
+        self._shown = shown
+        self._top = 0
+        self._selected.clear()
+        self._render()
+
+    def total(self) -> int:
+        return len(self._shown) if self._shown is not None else len(self._rows)
+
+    def row_number(self, pos: int) -> int:
+        return self._shown[pos] if self._shown is not None else pos
+
+    def refresh(self) -> None:
+        """Call after rows were appended; redraws only if the visible window can change."""
+        if not self._iids or (self._attached < len(self._iids) and self._top + self._attached < self.total()):
+            self._render()
+        else:
+            self._update_scrollbar()
+
+    # Geometry and scrolling
+
+    def _visible(self) -> int:
+        height = self.tree.winfo_height()
+        # The heading takes roughly one row
+        return max(1, height // self._row_height - 1) if height > 1 else 20
+
+    def _page(self) -> int:
+        return max(1, len(self._iids) - 1)
+
+    def _resize(self) -> None:
+        want = self._visible()
+        while len(self._iids) < want:
+            iid = self.tree.insert("", tk.END, values=())
+            self.tree.detach(iid)
+            self._iids.append(iid)
+        if len(self._iids) > want:
+            self.tree.delete(*self._iids[want:])
+            del self._iids[want:]
+            self._attached = min(self._attached, want)
+        self._render()
+
+    def scroll(self, delta: int) -> str:
+        self.scroll_to(self._top + delta)
+        return "break"
+
+    def scroll_to(self, top: int) -> str:
+        top = max(0, min(top, self.total() - len(self._iids)))
+        if top != self._top:
+            self._top = top
+            self._render()
+        return "break"
+
+    def _on_wheel(self, event) -> str:
+        return self.scroll(-3 if event.delta > 0 else 3)
+
+    def _on_scrollbar(self, *args) -> None:
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * self.total()))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            self.scroll(step * self._page() if args[2] == "pages" else step)
+
+    def _update_scrollbar(self) -> None:
+        total = self.total()
+        if total <= 0:
+            self.scrollbar.set(0.0, 1.0)
+            return
+        self.scrollbar.set(self._top / total, min(1.0, (self._top + len(self._iids)) / total))
+
+    # Rendering
+
+    def _render(self) -> None:
+        if not self._iids:
+            # Items are created on the first <Configure>, once the size is known
+            if self.tree.winfo_ismapped():
+                self._resize()
+            else:
+                self._update_scrollbar()
+            return
+        total = self.total()
+        count = max(0, min(len(self._iids), total - self._top))
+        for k in range(count):
+            values, tags = self._format_row(self._rows[self.row_number(self._top + k)])
+            self.tree.item(self._iids[k], values=values, tags=tags)
+        # Attach or detach only the items whose visibility changed
+        for k in range(self._attached, count):
+            self.tree.move(self._iids[k], "", k)
+        if count < self._attached:
+            self.tree.detach(*self._iids[count:self._attached])
+        self._attached = count
+        # The resulting <<TreeviewSelect>> maps back to the same rows
+        self.tree.selection_set([self._iids[k] for k in range(count)
+                                 if self.row_number(self._top + k) in self._selected])
+        self._update_scrollbar()
+
+    # Selection
+
+    def _on_click(self, event) -> None:
+        # A plain click replaces the selection, including rows scrolled out of view
+        if not event.state & 0x0005:  # Shift / Control
+            self._selected.clear()
+
+    def _on_right_click(self, event) -> None:
+        # Right-clicking outside the selection selects just that row, as in file managers
+        iid = self.tree.identify_row(event.y)
+        row = self.row_at(iid)
+        if row is None:
+            return
+        self.tree.focus(iid)
+        if row not in self._selected:
+            self._selected = {row}
+            self.tree.selection_set(iid)
+
+    def _on_select(self, _event=None) -> None:
+        on_screen = {self.row_number(self._top + k) for k in range(self._attached)}
+        picked = {self.row_number(self._top + self._iids.index(iid)) for iid in self.tree.selection()
+                  if iid in self._iids[:self._attached]}
+        # Rows scrolled out of view keep their selection
+        self._selected = (self._selected - on_screen) | picked
+
+    def _step(self, delta: int) -> str:
+        total = self.total()
+        if not total:
+            return "break"
+        focus = self.tree.focus()
+        pos = self._top + self._iids.index(focus) if focus in self._iids[:self._attached] else self._top
+        pos = max(0, min(total - 1, pos + delta))
+        if pos < self._top:
+            self.scroll_to(pos)
+        elif pos >= self._top + len(self._iids):
+            self.scroll_to(pos - len(self._iids) + 1)
+        self._selected = {self.row_number(pos)}
+        self._render()
+        iid = self._iids[pos - self._top]
+        self.tree.focus(iid)
+        return "break"
+
+    def selected_rows(self) -> List[int]:
+        return sorted(self._selected)
+
+    def row_at(self, iid: str) -> Optional[int]:
+        """Row number shown by a Treeview item, or None for a blank item."""
+        if iid not in self._iids[:self._attached]:
+            return None
+        return self.row_number(self._top + self._iids.index(iid))
@@ -0,0 +1,338 @@
+"""Watch mode: sort new arrivals as they land instead of rescanning everything.
+
+Changes come from inotify on Linux (through ctypes) or, elsewhere, from a
+poller that only re-lists directories whose mtime changed. A new file is
+handled once its size and mtime stayed the same for ``settle`` seconds, so
+downloads still being written are left alone. Ready files go through the
+normal planner and apply_moves, one journal batch per group.
+"""
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+from .preview import Planner, PreviewItem
+from .scanner import OWN_FILES, FileEntry, compile_excludes, scan_entries
+from .utils.hash_cache import open_hash_caches
+from .utils.os_ops import RACY_NS
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0x00000800
+_IN_CLOEXEC = 0x00080000
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+_EVENT = struct.Struct("iIII")
+
+
+class _InotifyBackend:
+    """Directory watches through the Linux inotify syscalls."""
+
+    name = "inotify"
+
+    def __init__(self, accept_dir: Callable[[str], bool], recursive: bool):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._fd = fd
+        self._accept_dir = accept_dir
+        self._recursive = recursive
+        self._wds: Dict[int, str] = {}
+
+    def _watch(self, path: str) -> bool:
+        wd = self._add_watch(self._fd, os.fsencode(path), _WATCH_MASK)
+        if wd < 0:
+            return False
+        self._wds[wd] = path
+        return True
+
+    def add_tree(self, root: str) -> List[str]:
+        """Watch ``root`` (and its accepted subdirectories); returns the files already inside."""
+        found: List[str] = []
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            if not self._watch(path):
+                continue
+            try:
+                with os.scandir(path) as it:
+                    for entry in it:
+                        try:
+                            is_dir = entry.is_dir(follow_symlinks=False)
+                        except OSError:
+                            continue
+                        if not is_dir:
+                            found.append(entry.path)
+                        elif self._recursive and self._accept_dir(entry.path):
+                            stack.append(entry.path)
+            except OSError:
+                pass
+        return found
+
+    @property
+    def dirs(self) -> int:
+        return len(self._wds)
+
+    def poll(self, timeout: Optional[float]) -> Tuple[List[str], bool]:
+        """Changed file paths, and whether the kernel queue overflowed."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return [], False
+        paths: List[str] = []
+        overflow = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            pos = 0
+            while pos + _EVENT.size <= len(data):
+                wd, mask, _cookie, length = _EVENT.unpack_from(data, pos)
+                raw = data[pos + _EVENT.size:pos + _EVENT.size + length].rstrip(b"\0")
+                pos += _EVENT.size + length
+                if mask & _IN_Q_OVERFLOW:
+                    overflow = True
+                    continue
+                if mask & _IN_IGNORED:
+                    self._wds.pop(wd, None)
+                    continue
+                parent = self._wds.get(wd)
+                if parent is None or not raw:
+                    continue
+                path = os.path.join(parent, os.fsdecode(raw))
+                if mask & _IN_ISDIR:
+                    if self._recursive and mask & (_IN_CREATE | _IN_MOVED_TO) and self._accept_dir(path):
+                        # Files may have landed before the watch existed
+                        paths.extend(self.add_tree(path))
+                else:
+                    paths.append(path)
+        return paths, overflow
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+
+class _PollingBackend:
+    """Portable fallback: stats every watched directory, re-lists only changed ones."""
+
+    name = "polling"
+
+    def __init__(self, accept_dir: Callable[[str], bool], recursive: bool, interval: float = 2.0):
+        self._accept_dir = accept_dir
+        self._recursive = recursive
+        self.interval = interval
+        # dir -> (mtime_ns, names seen)
+        self._dirs: Dict[str, Tuple[int, Set[str]]] = {}
+        self._next_scan = time.monotonic() + interval
+
+    def _list(self, path: str) -> Tuple[List[str], List[str]]:
+        files: List[str] = []
+        subdirs: List[str] = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        is_dir = entry.is_dir(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    (subdirs if is_dir else files).append(entry.path)
+        except OSError:
+            pass
+        return files, subdirs
+
+    def add_tree(self, root: str) -> List[str]:
+        found: List[str] = []
+        stack = [root]
+        while stack:
+            path = stack.pop()
+            try:
+                mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            files, subdirs = self._list(path)
+            self._dirs[path] = (mtime, {os.path.basename(p) for p in files + subdirs})
+            found.extend(files)
+            if self._recursive:
+                stack.extend(d for d in subdirs if self._accept_dir(d))
+        return found
+
+    @property
+    def dirs(self) -> int:
+        return len(self._dirs)
+
+    def poll(self, timeout: Optional[float]) -> Tuple[List[str], bool]:
+        wait = self._next_scan - time.monotonic()
+        if timeout is not None and timeout < wait:
+            time.sleep(max(0.0, timeout))
+            return [], False
+        time.sleep(max(0.0, wait))
+        self._next_scan = time.monotonic() + self.interval
+        paths: List[str] = []
+        racy_after = time.time_ns() - RACY_NS
+        for path, (mtime, names) in list(self._dirs.items()):
+            try:
+                now_mtime = os.stat(path).st_mtime_ns
+            except OSError:
+                del self._dirs[path]
+                continue
+            # A directory touched within the mtime granularity may change again unseen
+            if now_mtime == mtime and mtime < racy_after:
+                continue
+            files, subdirs = self._list(path)
+            current = {os.path.basename(p) for p in files + subdirs}
+            self._dirs[path] = (now_mtime, current)
+            paths.extend(p for p in files if os.path.basename(p) not in names)
+            if self._recursive:
+                for d in subdirs:
+                    if os.path.basename(d) not in names and self._accept_dir(d):
+                        paths.extend(self.add_tree(d))
+        return paths, False
+
+    def close(self) -> None:
+        pass
+
+
+class _Debouncer:
+    """Holds candidate files until their size and mtime stop changing."""
+
+    def __init__(self, settle: float):
+        self.settle = settle
+        # path -> (deadline, (size, mtime_ns) at the last look)
+        self._pending: Dict[str, Tuple[float, Tuple[int, int]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def touch(self, path: str, now: float) -> None:
+        try:
+            st = os.stat(path)
+        except OSError:
+            self._pending.pop(path, None)
+            return
+        self._pending[path] = (now + self.settle, (st.st_size, st.st_mtime_ns))
+
+    def next_deadline(self) -> Optional[float]:
+        return min((d for d, _ in self._pending.values()), default=None)
+
+    def ready(self, now: float) -> List[Tuple[str, os.stat_result]]:
+        out = []
+        for path, (deadline, sig) in list(self._pending.items()):
+            if deadline > now:
+                continue
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self._pending[path]
+                continue
+            if (st.st_size, st.st_mtime_ns) == sig:
+                del self._pending[path]
+                out.append((path, st))
+            else:
+                self._pending[path] = (now + self.settle, (st.st_size, st.st_mtime_ns))
+        return out
+
+
+class Watcher:
+    """Sorts files arriving under the include paths until ``stop`` is called."""
+
+    def __init__(self, cfg: Dict, settle: float = 2.0, force_polling: bool = False,
+                 poll_interval: float = 2.0, report: Optional[Callable[[Dict], None]] = None):
+        self.cfg = cfg
+        self.report = report
+        self.roots = [os.path.abspath(p) for p in cfg.get("include_paths", []) if os.path.isdir(p)]
+        self.include_hidden = cfg.get("ui", {}).get("show_hidden_files", False)
+        self.recursive = cfg.get("behavior", {}).get("sort_subfolders", True)
+        self.matcher = compile_excludes(cfg.get("exclude_globs", []))
+        self.debouncer = _Debouncer(settle)
+        self.batches = 0
+        self._stop = threading.Event()
+        self._started_ns = time.time_ns()
+        backend = None
+        if not force_polling and sys.platform.startswith("linux"):
+            try:
+                backend = _InotifyBackend(self._accept_dir, self.recursive)
+            except (OSError, AttributeError):
+                backend = None
+        self.backend = backend or _PollingBackend(self._accept_dir, self.recursive, poll_interval)
+
+    def _emit(self, event: str, text: str, **fields) -> None:
+        if self.report is None:
+            print(text)
+        else:
+            self.report(dict(event=event, **fields))
+
+    def _accept_name(self, name: str) -> bool:
+        if not self.include_hidden and name.startswith("."):
+            return False
+        return not self.matcher.match(name)
+
+    def _accept_dir(self, path: str) -> bool:
+        return self._accept_name(os.path.basename(path))
+
+    def _accept_file(self, path: str) -> bool:
+        name = os.path.basename(path)
+        return name not in OWN_FILES and self._accept_name(name)
+
+    def _candidates(self, paths: List[str], now: float) -> None:
+        for path in paths:
+            if self._accept_file(path):
+                self.debouncer.touch(path, now)
+
+    def _rescan_recent(self, now: float) -> None:
+        # Events were lost: pick up anything modified since the watch started
+        for entry in scan_entries(self.roots, list(self.matcher.patterns), self.include_hidden, self.recursive):
+            if entry.mtime_ns >= self._started_ns:
+                self.debouncer.touch(entry.path, now)
+
+    def _sort(self, ready) -> None:
+        from .apply_moves import apply_moves
+        caches = open_hash_caches(self.cfg)
+        # A fresh planner per batch: destination folders may have changed meanwhile
+        planner = Planner(self.cfg, None, caches)
+        items: List[PreviewItem] = []
+        for path, st in ready:
+            entry = FileEntry(path, os.path.splitext(path)[1], st.st_size, st.st_mtime_ns, st.st_dev, st.st_ino)
+            items.append(planner.replan(entry))
+        if caches is not None:
+            caches.save()
+        if any(item.action == "MOVE" for item in items):
+            self.batches += 1
+            apply_moves(items, self.cfg, report=self.report)
+
+    def run(self) -> None:
+        for root in self.roots:
+            # Files already present are not new arrivals
+            self.backend.add_tree(root)
+        self._emit("watching", f"[WATCH] {self.backend.name}: watching {self.backend.dirs} folders",
+                   backend=self.backend.name, dirs=self.backend.dirs, roots=self.roots)
+        try:
+            while not self._stop.is_set():
+                deadline = self.debouncer.next_deadline()
+                # Idle: block in the kernel; the 1 s cap only bounds the reaction to stop()
+                timeout = 1.0 if deadline is None else max(0.0, min(1.0, deadline - time.monotonic()))
+                paths, overflow = self.backend.poll(timeout)
+                now = time.monotonic()
+                if overflow:
+                    self._emit("overflow", "[WATCH] event queue overflowed, rescanning")
+                    self._rescan_recent(now)
+                self._candidates(paths, now)
+                ready = self.debouncer.ready(now)
+                if ready:
+                    self._sort(ready)
+        finally:
+            self.backend.close()
+
+    def stop(self) -> None:
+        self._stop.set()
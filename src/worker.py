@@ -1,42 +1,121 @@
 import threading
 import queue
+import time
 from typing import Callable, Iterable, Any, Optional
 
 class Cancelled(Exception):
     pass
 
 class StreamWorker:
-    def __init__(self, target: Callable[[], Iterable[Any]], out_q: queue.Queue, cancel_event: threading.Event):
+    """Runs ``target()`` on a thread and ships its items to ``out_q`` in chunks.
+
+    Items travel as lists of up to ``chunk_size`` items; a partial chunk is
+    sent once it is ``chunk_interval`` seconds old, even while the source is
+    stalled on its next item, so one queue operation covers many items.
+    Errors are sent as ``("__ERROR__", msg)`` after the items before them,
+    and ``None`` always marks the end. Cancellation is still checked for
+    every item.
+    """
+
+    def __init__(self, target: Callable[[], Iterable[Any]], out_q: queue.Queue, cancel_event: threading.Event,
+                 chunk_size: int = 512, chunk_interval: float = 0.05):
         self._target = target
         self._out_q = out_q
         self._cancel = cancel_event
+        self._chunk_size = max(1, chunk_size)
+        self._chunk_interval = chunk_interval
         self._thread: Optional[threading.Thread] = None
+        # Filled by the producer thread, shipped by _run
+        self._cond = threading.Condition()
+        self._pending: list = []
+        self._started = 0.0
+        self._done = False
+        self._error: Optional[str] = None
 
     def start(self) -> None:
         self._thread = threading.Thread(target=self._run, daemon=True)
         self._thread.start()
 
-    def _run(self):
+    def _put(self, obj) -> None:
+        while True:
+            if self._cancel.is_set():
+                raise Cancelled()
+            try:
+                self._out_q.put(obj, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _produce(self):
+        it = None
+        cond = self._cond
         try:
-            for item in self._target():
+            it = iter(self._target())
+            for item in it:
+                if self._cancel.is_set():
+                    return
+                with cond:
+                    # Bounded: wait while a full chunk is still waiting to be shipped
+                    while len(self._pending) >= self._chunk_size:
+                        if self._cancel.is_set():
+                            return
+                        cond.wait(0.1)
+                    if not self._pending:
+                        self._started = time.monotonic()
+                    self._pending.append(item)
+                    if len(self._pending) >= self._chunk_size:
+                        cond.notify_all()
+        except Exception as e:
+            self._error = str(e)
+        finally:
+            # Stop generator-backed sources (and their thread pools) promptly
+            close = getattr(it, "close", None)
+            if close is not None:
+                try:
+                    close()
+                except Exception:
+                    pass
+            with cond:
+                self._done = True
+                cond.notify_all()
+
+    def _take(self) -> Optional[list]:
+        """Next chunk to ship (full, old enough, or the last one); None once the source is done."""
+        cond = self._cond
+        with cond:
+            while True:
+                pending = self._pending
+                if pending:
+                    age = time.monotonic() - self._started
+                    if len(pending) >= self._chunk_size or self._done or age >= self._chunk_interval:
+                        self._pending = []
+                        cond.notify_all()
+                        return pending
+                    cond.wait(self._chunk_interval - age)
+                elif self._done:
+                    return None
+                else:
+                    cond.wait(0.1)
                 if self._cancel.is_set():
                     raise Cancelled()
-                while True:
-                    if self._cancel.is_set():
-                        raise Cancelled()
-                    try:
-                        self._out_q.put(item, timeout=0.1)
-                        break
-                    except queue.Full:
-                        continue
+
+    def _run(self):
+        producer = threading.Thread(target=self._produce, daemon=True)
+        producer.start()
+        try:
+            while True:
+                chunk = self._take()
+                if chunk is None:
+                    break
+                self._put(chunk)
+            if self._error is not None:
+                self._out_q.put(("__ERROR__", self._error))
         except Cancelled:
             pass
-        except Exception as e:
-            try:
-                self._out_q.put(("__ERROR__", str(e)))
-            except Exception:
-                pass
+        except Exception:
+            pass
         finally:
+            producer.join()
             try:
                 self._out_q.put(None)
             except Exception:
@@ -44,11 +123,14 @@ class StreamWorker:
 
 class ApplyWorker:
     def __init__(self, preview_iter_fn: Callable[[], Iterable[Any]], apply_fn: Callable[[Iterable[Any]], None],
-                 cancel_event: threading.Event, progress_cb: Optional[Callable[[str], None]] = None):
+                 cancel_event: threading.Event, progress_cb: Optional[Callable[[str], None]] = None,
+                 metrics=None):
         self._iter_fn = preview_iter_fn
         self._apply_fn = apply_fn
         self._cancel = cancel_event
         self._progress_cb = progress_cb
+        # instrument.Metrics to report through progress_cb when the apply ends
+        self._metrics = metrics
         self._thread: Optional[threading.Thread] = None
         self.done_event = threading.Event()
 
@@ -68,6 +150,8 @@ class ApplyWorker:
             self._apply_fn(cancellable_iter())
             if self._progress_cb:
                 self._progress_cb("[Worker] Apply finished")
+                if self._metrics is not None:
+                    self._progress_cb(f"[METRICS] {self._metrics.summary()}")
         except Exception as e:
             if self._progress_cb:
                 self._progress_cb(f"[Worker ERROR] {e}")
@@ -0,0 +1,82 @@
+"""The headless CLI: output flushing and Ctrl-C during apply."""
+import io
+import json
+import os
+import shutil
+import signal
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from src import apply_moves
+from src.cli import JsonLines, main
+from src.config import get_default_config
+
+
+class _Stream(io.StringIO):
+    """Records what had been flushed."""
+
+    flushed = ""
+
+    def flush(self):
+        self.flushed = self.getvalue()
+
+
+class JsonLinesTest(unittest.TestCase):
+    def test_quiet_output_is_flushed_by_the_timer(self):
+        stream = _Stream()
+        out = JsonLines(stream, flush_interval=0.05)
+        out({"event": "moved"})
+        out({"event": "transfer"})
+        self.assertEqual(stream.flushed, "")
+        time.sleep(0.3)
+        self.assertEqual(stream.flushed, '{"event": "moved"}\n{"event": "transfer"}\n')
+        out.close()
+
+    def test_zero_interval_flushes_every_line(self):
+        stream = _Stream()
+        out = JsonLines(stream, flush_interval=0.0)
+        out({"event": "moved"})
+        self.assertEqual(stream.flushed, '{"event": "moved"}\n')
+
+
+class ApplyInterruptTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="fileflow-test-")
+        self.addCleanup(shutil.rmtree, self.root, True)
+        for i in range(5):
+            with open(os.path.join(self.root, f"file{i}.txt"), "w") as f:
+                f.write(str(i))
+        self.cfg = get_default_config()
+        self.cfg["include_paths"] = [self.root]
+        self.cfg["destination_roots"] = [""]
+        self.cfg["behavior"]["cache_dir"] = os.path.join(self.root, "..", os.path.basename(self.root) + "-state")
+        self.addCleanup(shutil.rmtree, self.cfg["behavior"]["cache_dir"], True)
+
+    def test_ctrl_c_stops_starting_moves(self):
+        real_move = apply_moves.move_file
+
+        def move_then_interrupt(*args, **kwargs):
+            kind = real_move(*args, **kwargs)
+            os.kill(os.getpid(), signal.SIGINT)
+            return kind
+
+        stdout = io.StringIO()
+        with mock.patch("src.config.load_config", return_value=self.cfg), \
+             mock.patch.object(apply_moves, "move_file", move_then_interrupt), \
+             mock.patch("sys.stdout", stdout):
+            code = main(["apply"])
+        events = [json.loads(line) for line in stdout.getvalue().splitlines()]
+        names = [e.get("event") for e in events]
+        self.assertEqual(code, 130)
+        self.assertEqual(names.count("moved"), 1)
+        self.assertIn({"event": "cancelled", "count": 4}, events)
+        self.assertEqual(names[-1], "interrupted")
+        self.assertEqual(len([n for n in os.listdir(self.root) if n.endswith(".txt")]), 4)
+        # The handler is removed again
+        self.assertIs(signal.getsignal(signal.SIGINT), signal.default_int_handler)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+"""Config validation and the load/save round trip."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.config import get_default_config, load_config, save_config, validate_config
+
+
+class ConfigTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="fileflow-test-")
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.path = os.path.join(self.dir, "config.json")
+        self.cfg = get_default_config()
+        self.cfg["include_paths"] = [self.dir]
+        self.cfg["destination_roots"] = [""]
+
+    def test_defaults_are_valid(self):
+        self.assertEqual(validate_config(get_default_config()), (True, []))
+
+    def test_valid_config_round_trips(self):
+        beh = self.cfg["behavior"]
+        beh.update(hash_algorithm="sha256", hash_workers=4, scan_workers=3, scan_snapshot=False,
+                   metrics=True, apply_workers=2, conflict_policy="suffix")
+        self.cfg["rules"] = {".iso": "Disk Images"}
+        save_config(self.cfg, self.path)
+        self.assertEqual(load_config(self.path), self.cfg)
+
+    def test_bad_hash_algorithm_is_rejected(self):
+        for name in ("shake_128", "no-such-digest", 5):
+            self.cfg["behavior"]["hash_algorithm"] = name
+            ok, errors = validate_config(self.cfg)
+            self.assertFalse(ok)
+            self.assertTrue(any(e.startswith("behavior.hash_algorithm") for e in errors), errors)
+            save_config(self.cfg, self.path)
+            # An invalid file falls back to the defaults as a whole
+            self.assertEqual(load_config(self.path)["behavior"]["hash_algorithm"], "blake2b")
+
+    def test_case_and_spacing_of_algorithm_accepted(self):
+        self.cfg["behavior"]["hash_algorithm"] = " SHA256 "
+        self.assertEqual(validate_config(self.cfg), (True, []))
+
+
+if __name__ == "__main__":
+    unittest.main()
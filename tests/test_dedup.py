@@ -0,0 +1,60 @@
+"""Digest caching in the tiered comparator."""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from src.utils.dedup import SAMPLE_BLOCK, files_identical, sample_hash
+from src.utils.hash_cache import HashCache, meta_key
+
+
+class SampleHashCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="fileflow-test-")
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.path = os.path.join(self.dir, "big.bin")
+        self.cache = HashCache(os.path.join(self.dir, "cache.json"))
+
+    def write(self, data: bytes, age: float) -> os.stat_result:
+        with open(self.path, "wb") as f:
+            f.write(data)
+        # Old enough not to be racy
+        when = time.time() - age
+        os.utime(self.path, (when, when))
+        return os.stat(self.path)
+
+    def test_unchanged_file_is_cached(self):
+        meta = self.write(b"a" * (4 * SAMPLE_BLOCK), 60)
+        digest = sample_hash(self.path, meta, cache=self.cache)
+        self.assertEqual(self.cache.get(meta_key(meta, "sample-blake2b")), digest)
+
+    def test_file_changed_since_meta_is_not_cached(self):
+        stale = self.write(b"a" * (4 * SAMPLE_BLOCK), 60)
+        # Rewritten after the caller's stat: same size, other contents and mtime
+        self.write(b"b" * (4 * SAMPLE_BLOCK), 30)
+        sample_hash(self.path, stale, cache=self.cache)
+        self.assertEqual(len(self.cache), 0)
+        self.assertIsNone(self.cache.get(meta_key(stale, "sample-blake2b")))
+
+    def test_racy_file_is_not_cached(self):
+        meta = self.write(b"a" * (4 * SAMPLE_BLOCK), 0)
+        sample_hash(self.path, meta, cache=self.cache)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_files_identical_with_cache(self):
+        meta = self.write(b"a" * (4 * SAMPLE_BLOCK), 60)
+        other = os.path.join(self.dir, "copy.bin")
+        shutil.copyfile(self.path, other)
+        os.utime(other, (meta.st_atime, meta.st_mtime))
+        for _ in range(2):
+            self.assertTrue(files_identical(self.path, other, cache=self.cache))
+        with open(other, "r+b") as f:
+            f.seek(2 * SAMPLE_BLOCK)
+            f.write(b"x")
+        os.utime(other, (meta.st_atime, meta.st_mtime - 5))
+        self.assertFalse(files_identical(self.path, other, cache=self.cache))
+
+
+if __name__ == "__main__":
+    unittest.main()
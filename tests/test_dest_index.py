@@ -0,0 +1,69 @@
+"""DestIndex suffix allocation."""
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.dest_index import DestIndex
+
+
+class AllocateSuffixTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="fileflow-test-")
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def touch(self, *names):
+        for name in names:
+            open(os.path.join(self.dir, name), "w").close()
+
+    def allocate(self, index: DestIndex, name: str) -> str:
+        path = index.allocate_suffix(os.path.join(self.dir, name))
+        index.propose(path)
+        return os.path.basename(path)
+
+    def test_fills_gaps(self):
+        self.touch("f.txt", "f (1).txt", "f (3).txt")
+        index = DestIndex()
+        self.assertEqual(self.allocate(index, "f.txt"), "f (2).txt")
+        self.assertEqual(self.allocate(index, "f.txt"), "f (4).txt")
+        self.assertEqual(self.allocate(index, "f.txt"), "f (5).txt")
+
+    def test_continues_from_an_existing_suffix(self):
+        self.touch("f (7).txt")
+        index = DestIndex()
+        self.assertEqual(self.allocate(index, "f (7).txt"), "f (8).txt")
+
+    def test_cursor_is_per_start_index(self):
+        # A cursor advanced from "(9)" must not make "f.txt" skip the free low numbers
+        self.touch("f.txt", "f (9).txt")
+        index = DestIndex()
+        self.assertEqual(self.allocate(index, "f (9).txt"), "f (10).txt")
+        self.assertEqual(self.allocate(index, "f.txt"), "f (1).txt")
+        self.assertEqual(self.allocate(index, "f (9).txt"), "f (11).txt")
+        self.assertEqual(self.allocate(index, "f.txt"), "f (2).txt")
+
+    def test_names_moved_in_during_the_run(self):
+        self.touch("f.txt")
+        index = DestIndex()
+        index.mark_existing(os.path.join(self.dir, "f (1).txt"))
+        self.assertEqual(self.allocate(index, "f.txt"), "f (2).txt")
+
+    def test_matches_naive_probing(self):
+        self.touch("a.txt", "a (2).txt", "a (3).txt", "a (6).txt", "b (1).txt")
+        index = DestIndex()
+        taken = set(os.listdir(self.dir))
+        for name in ["a.txt", "a (2).txt", "a.txt", "b (1).txt", "a (3).txt", "a.txt", "b (1).txt"]:
+            base, ext = os.path.splitext(name)
+            core, n = base, 1
+            if base.endswith(")") and " (" in base:
+                core, num = base[:-1].rsplit(" (", 1)
+                n = int(num) + 1
+            while f"{core} ({n}){ext}" in taken:
+                n += 1
+            expected = f"{core} ({n}){ext}"
+            taken.add(expected)
+            self.assertEqual(self.allocate(index, name), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+"""The directory snapshot: unchanged trees are not listed again."""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from src.config import get_default_config
+from src.dir_snapshot import open_dir_snapshot
+from src.preview import build_preview
+
+
+class DirSnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="fileflow-test-")
+        self.state = tempfile.mkdtemp(prefix="fileflow-state-")
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.addCleanup(shutil.rmtree, self.state, True)
+        os.makedirs(os.path.join(self.root, "sub"))
+        for rel in ("a.txt", "b.pdf", os.path.join("sub", "c.jpg")):
+            with open(os.path.join(self.root, rel), "w") as f:
+                f.write("data")
+        # Directories modified within the racy window are never served from the snapshot
+        self.old = time.time() - 60
+        self._age_dirs()
+        self.cfg = get_default_config()
+        self.cfg["include_paths"] = [self.root]
+        self.cfg["destination_roots"] = [""]
+        self.cfg["behavior"]["cache_dir"] = self.state
+
+    def _age_dirs(self):
+        for path in (os.path.join(self.root, "sub"), self.root):
+            os.utime(path, (self.old, self.old))
+
+    def _preview(self):
+        snapshot = open_dir_snapshot(self.cfg)
+        rows = {os.path.basename(item.src): item for item in build_preview(self.cfg, snapshot=snapshot)}
+        return snapshot, rows
+
+    def test_second_unchanged_preview_lists_nothing(self):
+        first, _ = self._preview()
+        self.assertEqual(first.dirs_listed, 2)
+        for _ in range(2):
+            again, rows = self._preview()
+            self.assertEqual((again.dirs_listed, again.dirs_skipped), (0, 2))
+            self.assertEqual(set(rows), {"a.txt", "b.pdf", "c.jpg"})
+        # Neither the snapshot nor the hash cache is written into the scanned root
+        self.assertEqual(sorted(os.listdir(self.root)), ["a.txt", "b.pdf", "sub"])
+
+    def test_served_entries_carry_current_size(self):
+        self._preview()
+        # An in-place edit leaves the directory's mtime alone
+        with open(os.path.join(self.root, "b.pdf"), "a") as f:
+            f.write("more bytes!")
+        self._age_dirs()
+        snapshot, rows = self._preview()
+        self.assertEqual(snapshot.dirs_listed, 0)
+        self.assertEqual(rows["b.pdf"].entry.size, 15)
+        self.assertEqual(rows["b.pdf"].entry.mtime_ns, os.stat(os.path.join(self.root, "b.pdf")).st_mtime_ns)
+
+
+if __name__ == "__main__":
+    unittest.main()
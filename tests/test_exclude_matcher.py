@@ -0,0 +1,93 @@
+"""ExcludeMatcher against fnmatch.fnmatch on random patterns and names.
+
+    python -m pytest tests        (or: python -m unittest discover tests)
+"""
+import fnmatch
+import ntpath
+import random
+import unittest
+from unittest import mock
+
+from src import scanner
+from src.scanner import ExcludeMatcher
+
+_CHARS = "abcAB01_-. "
+_EXTS = [".txt", ".TXT", ".tar.gz", ".gz", ".Jpg", ".jpg", ".", ".x.y", ""]
+
+
+def _word(rng: random.Random, low: int = 0, high: int = 6) -> str:
+    return "".join(rng.choice(_CHARS) for _ in range(rng.randint(low, high)))
+
+
+def _pattern(rng: random.Random) -> str:
+    kind = rng.randrange(7)
+    if kind == 0:
+        # Literal name: the set lookup
+        return _word(rng, 1) + rng.choice(_EXTS)
+    if kind == 1:
+        # "*.ext": the suffix set, including multi-dot and mixed-case suffixes
+        return "*" + (rng.choice(_EXTS[:-1]) or ".")
+    if kind == 2:
+        # Starts like a suffix pattern but has magic after the dot: regex
+        return "*." + rng.choice(["t?t", "[tj]*", "*", "g[!z]"])
+    if kind == 3:
+        return _word(rng, 1) + "*"
+    if kind == 4:
+        return rng.choice(["?", "[ab]", "[!a]", "[A-Z]"]) + _word(rng) + rng.choice(["*", "", "?"])
+    if kind == 5:
+        return "*" + _word(rng, 1) + "*"
+    # Brackets that are not a valid set, and a bare star
+    return rng.choice(["[", "a[b", "]x", "*", "**", "*.*", ".*"])
+
+
+def _name(rng: random.Random, patterns) -> str:
+    if patterns and rng.random() < 0.5:
+        # Derived from a pattern so that hits are common
+        out = []
+        for ch in rng.choice(patterns):
+            if ch == "*":
+                out.append(_word(rng, 0, 3))
+            elif ch == "?":
+                out.append(rng.choice(_CHARS))
+            elif ch not in "[]!":
+                out.append(ch.swapcase() if rng.random() < 0.2 else ch)
+        name = "".join(out)
+        if name:
+            return name
+    return _word(rng, 1) + rng.choice(_EXTS)
+
+
+class ExcludeMatcherCrossCheck(unittest.TestCase):
+    ROUNDS = 300
+    NAMES = 60
+
+    def _cross_check(self, seed: int) -> None:
+        rng = random.Random(seed)
+        for _ in range(self.ROUNDS):
+            patterns = [_pattern(rng) for _ in range(rng.randint(0, 6))]
+            matcher = ExcludeMatcher(patterns)
+            for _ in range(self.NAMES):
+                name = _name(rng, patterns)
+                expected = any(fnmatch.fnmatch(name, p) for p in patterns)
+                self.assertEqual(matcher.match(name), expected, f"{name!r} against {patterns!r}")
+
+    def test_matches_fnmatch(self):
+        with mock.patch.object(scanner, "_FOLD_CASE", False), \
+             mock.patch("os.path.normcase", lambda s: s):
+            self._cross_check(seed=2)
+
+    def test_matches_fnmatch_case_folded(self):
+        # Windows semantics on any platform: fnmatch picks up the patched normcase too
+        with mock.patch.object(scanner, "_FOLD_CASE", True), \
+             mock.patch("os.path.normcase", ntpath.normcase):
+            self._cross_check(seed=3)
+
+    def test_fast_paths_are_exercised(self):
+        matcher = ExcludeMatcher(["Thumbs.db", "*.tar.gz", "*.t?t"])
+        self.assertEqual(matcher._literals, frozenset({"Thumbs.db"}))
+        self.assertEqual(matcher._suffixes, frozenset({".tar.gz"}))
+        self.assertIsNotNone(matcher._regex)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+"""The write-ahead journal, its side index, the reverse reader and undo."""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from src.apply_moves import undo_all_stream, undo_last
+from src.journal import (JOURNAL_NAME, JournalWriter, iter_last_batch_reversed, iter_lines_reversed,
+                         last_batch_range)
+
+
+class _Dir(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="fileflow-test-")
+        self.addCleanup(shutil.rmtree, self.root, True)
+        self.journal = os.path.join(self.root, JOURNAL_NAME)
+
+    def path(self, *parts) -> str:
+        return os.path.join(self.root, *parts)
+
+    def write_batch(self, pairs, close: bool = True) -> JournalWriter:
+        journal = JournalWriter(self.journal)
+        for src, dest in pairs:
+            journal.record(src, dest)
+        journal.commit()
+        if close:
+            journal.close()
+        return journal
+
+
+class ReverseReaderTest(_Dir):
+    def test_block_boundaries_inside_lines(self):
+        lines = [b"x" * n for n in (1, 5, 0, 17, 64, 3, 0, 0, 9, 130, 2)]
+        with open(self.journal, "wb") as f:
+            f.write(b"\n".join(lines) + b"\n")
+        expected = [line for line in reversed(lines) if line]
+        for block in (1, 2, 3, 7, 16, 63, 64, 65, 4096):
+            self.assertEqual(list(iter_lines_reversed(self.journal, block=block)), expected, block)
+
+    def test_range_boundaries_inside_lines(self):
+        with open(self.journal, "wb") as f:
+            f.write(b"aaa\nbbbbb\ncc\ndddddd\n")
+        # [4, 13) is "bbbbb\ncc\n"
+        for block in (1, 3, 4, 64):
+            self.assertEqual(list(iter_lines_reversed(self.journal, 4, 13, block=block)), [b"cc", b"bbbbb"])
+
+    def test_missing_final_newline(self):
+        with open(self.journal, "wb") as f:
+            f.write(b"one\ntwo")
+        self.assertEqual(list(iter_lines_reversed(self.journal, block=2)), [b"two", b"one"])
+
+
+class LastBatchTest(_Dir):
+    def test_index_seek(self):
+        self.write_batch([("/a/1", "/b/1")])
+        second = self.write_batch([("/a/2", "/b/2"), ("/a/3", "/b/3")])
+        rec = last_batch_range(self.journal)
+        self.assertEqual((rec["batch"], rec["count"]), (second.batch, 2))
+        self.assertEqual([e["seq"] for e in iter_last_batch_reversed(self.journal)], [2, 1])
+
+    def test_size_mismatch_falls_back_to_scanning(self):
+        self.write_batch([("/a/1", "/b/1")])
+        # A crash before close: entries on disk, no index record for them
+        crashed = self.write_batch([("/a/2", "/b/2"), ("/a/3", "/b/3")], close=False)
+        crashed._f.close()
+        self.assertIsNone(last_batch_range(self.journal))
+        entries = list(iter_last_batch_reversed(self.journal))
+        self.assertEqual([(e["batch"], e["src_before"]) for e in entries],
+                         [(crashed.batch, "/a/3"), (crashed.batch, "/a/2")])
+
+    def test_legacy_entries_grouped_by_time(self):
+        legacy = [("/a/1", "T1"), ("/a/2", "T1"), ("/a/3", "T2"), ("/a/4", "T2")]
+        with open(self.journal, "w", encoding="utf-8") as f:
+            for src, when in legacy:
+                f.write(json.dumps({"src_before": src, "dest_after": src + ".moved", "time": when}) + "\n")
+        self.assertEqual([e["src_before"] for e in iter_last_batch_reversed(self.journal)], ["/a/4", "/a/3"])
+
+
+class UndoSkipsFailedTest(_Dir):
+    def setUp(self):
+        super().setUp()
+        os.makedirs(self.path("Docs"))
+        journal = JournalWriter(self.journal)
+        seqs = {}
+        for name in ("a.txt", "b.txt", "c.txt"):
+            with open(self.path(name), "w") as f:
+                f.write(name)
+            seqs[name] = journal.record(self.path(name), self.path("Docs", name))
+        journal.commit()
+        # a and c moved; b's move failed and an unrelated file sits at its destination
+        for name in ("a.txt", "c.txt"):
+            os.rename(self.path(name), self.path("Docs", name))
+        with open(self.path("Docs", "b.txt"), "w") as f:
+            f.write("someone else's")
+        journal.mark_failed(seqs["b.txt"])
+        journal.close()
+        self.cfg = {"include_paths": [self.root]}
+
+    def _check(self, events):
+        restored = sorted(os.path.basename(e["src_before"]) for e in events if e["event"] == "undone")
+        self.assertEqual(restored, ["a.txt", "c.txt"])
+        with open(self.path("Docs", "b.txt")) as f:
+            self.assertEqual(f.read(), "someone else's")
+        with open(self.path("b.txt")) as f:
+            self.assertEqual(f.read(), "b.txt")
+
+    def test_undo_last(self):
+        events = []
+        undo_last(self.cfg, report=events.append)
+        self._check(events)
+
+    def test_undo_all(self):
+        events = []
+        undo_all_stream(self.cfg, report=events.append)
+        self._check(events)
+
+
+if __name__ == "__main__":
+    unittest.main()
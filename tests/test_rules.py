@@ -0,0 +1,37 @@
+"""Destination lookups through the cached rule resolver."""
+import copy
+import unittest
+
+from src.config import get_default_config, resolve_destination_for_extension
+from src.rules import get_resolver
+
+
+class ResolverCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.cfg = get_default_config()
+
+    def test_unchanged_rules_reuse_the_resolver(self):
+        self.assertIs(get_resolver(self.cfg), get_resolver(self.cfg))
+        # Equal rules in another config object compile to the same table
+        self.assertIs(get_resolver(copy.deepcopy(self.cfg)), get_resolver(self.cfg))
+
+    def test_in_place_custom_rule_edits_are_seen(self):
+        self.assertEqual(resolve_destination_for_extension(".flac", self.cfg), "Music")
+        self.cfg["custom_rules"][0]["destination"] = "Audio Library"
+        self.assertEqual(resolve_destination_for_extension(".flac", self.cfg), "Audio Library")
+        self.cfg["custom_rules"][0]["extensions"].remove(".flac")
+        self.assertEqual(resolve_destination_for_extension(".flac", self.cfg), "Audio")
+        self.cfg["custom_rules"].append({"name": "Books", "extensions": [".epub"], "destination": "Books"})
+        self.assertEqual(resolve_destination_for_extension(".epub", self.cfg), "Books")
+
+    def test_rules_map_wins_and_edits_are_seen(self):
+        self.cfg["rules"] = {"mp3": "Podcasts"}
+        self.assertEqual(resolve_destination_for_extension(".MP3", self.cfg), "Podcasts")
+        self.cfg["rules"]["mp3"] = "Talks"
+        self.assertEqual(resolve_destination_for_extension(".mp3", self.cfg), "Talks")
+        del self.cfg["rules"]["mp3"]
+        self.assertEqual(resolve_destination_for_extension(".mp3", self.cfg), "Music")
+
+
+if __name__ == "__main__":
+    unittest.main()
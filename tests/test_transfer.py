@@ -0,0 +1,95 @@
+"""move_file: no-replace renames, the exclusive copy and the cross-device fallback."""
+import errno
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from src.utils import transfer
+from src.utils.transfer import TransferStats, move_file
+
+_COPY_KINDS = {"copy_file_range", "sendfile", "buffered_copy"}
+
+
+class MoveFileTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp(prefix="fileflow-test-")
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.src = self.write("src.bin", b"new contents")
+        self.dest = os.path.join(self.dir, "dest.bin")
+
+    def write(self, name: str, data: bytes) -> str:
+        path = os.path.join(self.dir, name)
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+    def read(self, path: str) -> bytes:
+        with open(path, "rb") as f:
+            return f.read()
+
+    def assert_refuses(self, same_device):
+        self.write("dest.bin", b"existing")
+        with self.assertRaises(FileExistsError):
+            move_file(self.src, self.dest, same_device)
+        self.assertEqual(self.read(self.dest), b"existing")
+        self.assertEqual(self.read(self.src), b"new contents")
+
+    def test_rename(self):
+        self.assertEqual(move_file(self.src, self.dest, True), "rename")
+        self.assertFalse(os.path.exists(self.src))
+        self.assertEqual(self.read(self.dest), b"new contents")
+
+    def test_rename_never_replaces(self):
+        self.assert_refuses(True)
+
+    def test_hard_link_path_never_replaces(self):
+        with mock.patch.object(transfer, "_renameat2", None):
+            self.assert_refuses(True)
+            os.remove(self.dest)
+            self.assertEqual(move_file(self.src, self.dest, True), "rename")
+        self.assertFalse(os.path.exists(self.src))
+
+    def test_without_hard_links_never_replaces(self):
+        no_links = OSError(errno.EPERM, "hard links not supported")
+        with mock.patch.object(transfer, "_renameat2", None), mock.patch("os.link", side_effect=no_links):
+            self.assert_refuses(True)
+            os.remove(self.dest)
+            self.assertEqual(move_file(self.src, self.dest, True), "rename")
+        self.assertEqual(self.read(self.dest), b"new contents")
+
+    def test_copy_never_replaces(self):
+        # Cross-device moves copy into a file opened with "x"
+        self.assert_refuses(False)
+
+    def test_exdev_falls_back_to_copy(self):
+        stats = TransferStats()
+        exdev = OSError(errno.EXDEV, "cross-device link")
+        with mock.patch.object(transfer, "_rename_noreplace", side_effect=exdev):
+            kind = move_file(self.src, self.dest, None, stats=stats)
+        self.assertIn(kind, _COPY_KINDS)
+        self.assertFalse(os.path.exists(self.src))
+        self.assertEqual(self.read(self.dest), b"new contents")
+        self.assertEqual(stats.as_dict()[kind]["bytes"], len(b"new contents"))
+
+    def test_other_rename_errors_propagate(self):
+        denied = OSError(errno.EACCES, "denied")
+        with mock.patch.object(transfer, "_rename_noreplace", side_effect=denied):
+            with self.assertRaises(PermissionError):
+                move_file(self.src, self.dest, True)
+        self.assertTrue(os.path.exists(self.src))
+
+    @unittest.skipIf(sys.platform.startswith("win"), "symlinks need extra privileges on Windows")
+    def test_symlink_never_replaced(self):
+        link = os.path.join(self.dir, "link")
+        os.symlink(self.src, link)
+        self.write("dest.bin", b"existing")
+        with self.assertRaises(FileExistsError):
+            move_file(link, self.dest, False)
+        self.assertEqual(self.read(self.dest), b"existing")
+
+
+if __name__ == "__main__":
+    unittest.main()